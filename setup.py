@@ -152,7 +152,7 @@ setup(name = 'pyctools.core',
       entry_points = {
           'console_scripts' : console_scripts,
           },
-      install_requires = ['cython', 'numpy'],
+      install_requires = ['cython', 'numpy', 'futures; python_version < "3"'],
       cmdclass = cmdclass,
       command_options = command_options,
       zip_safe = False,
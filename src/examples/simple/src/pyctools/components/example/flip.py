@@ -42,8 +42,7 @@ class Flip(Transformer):
             flip = PIL.Image.FLIP_LEFT_RIGHT
         in_data = in_frame.as_PIL()
         out_frame.data = in_data.transpose(flip)
-        audit = out_frame.metadata.get('audit')
-        audit += 'data = Flip(data)\n'
+        audit = 'data = Flip(data)\n'
         audit += '    direction: %s\n' % direction
-        out_frame.metadata.set('audit', audit)
+        out_frame.metadata.extend_audit(audit)
         return True
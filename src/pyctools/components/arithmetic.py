@@ -38,27 +38,109 @@ Note the liberal use of ``pt_float`` to coerce data to the Pyctools
 default floating point type (``numpy.float32``). NumPy will otherwise
 convert Python :py:class:`float` to ``numpy.float64``.
 
+If the expression only uses ``data``, numbers, arithmetic and
+comparison operators, ``pt_float``, ``pt_complex`` and NumPy "ufuncs"
+(such as ``numpy.sqrt``) then each output pixel depends only on the
+same input pixel. A :py:class:`~pyctools.core.compound.Compound`
+component can then run the expression as part of a fused chain of
+such components, and a :py:class:`~pyctools.core.stripes.Stripes`
+component can split each frame into stripes.
+
 """
 
 __all__ = ['Arithmetic']
 __docformat__ = 'restructuredtext en'
 
+import ast
+import sys
+
 import numpy
 
 from pyctools.core.config import ConfigStr
 from pyctools.core.base import Transformer
 from pyctools.core.types import pt_float, pt_complex
 
+# AST nodes for literal values
+if sys.version_info >= (3, 8):
+    _constants = (ast.Constant,)
+else:
+    _constants = (ast.Num, ast.Str)
+
 class Arithmetic(Transformer):
     def initialise(self):
         self.config['func'] = ConfigStr(value='data')
+        self.func = None
+
+    def elementwise(self, in_frame, out_frame):
+        """Get a function to apply the expression to part of a frame.
+
+        :return: The function, or ``None`` if the expression is not
+            elementwise.
+
+        """
+        self.update_config()
+        func = self.config['func']
+        if func != self.func:
+            self.func = func
+            self.code = None
+            if self.is_elementwise(func):
+                self.code = compile(func, '<func>', 'eval')
+        if not self.code:
+            return None
+        out_frame.metadata.extend_audit('data = %s\n' % func)
+        code = self.code
+        return lambda data: eval(code, globals(), {'data': data})
+
+    def vertical_support(self):
+        """Get the number of lines above and below each pixel that are
+        used to compute it.
+
+        See :py:mod:`pyctools.core.stripes`.
+
+        :return: ``(0, 0)``, or ``None`` if the expression is not
+            elementwise.
+
+        """
+        self.update_config()
+        if self.is_elementwise(self.config['func']):
+            return 0, 0
+        return None
+
+    @staticmethod
+    def is_elementwise(func):
+        """Check if an expression only does per-pixel operations."""
+        try:
+            tree = ast.parse(func, mode='eval')
+        except SyntaxError:
+            return False
+        names = ('data', 'numpy', 'pt_float', 'pt_complex')
+        nodes = (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Compare,
+                 ast.Load, ast.operator, ast.unaryop, ast.cmpop) + _constants
+        has_data = False
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Name):
+                if node.id not in names:
+                    return False
+                has_data = has_data or node.id == 'data'
+            elif isinstance(node, ast.Attribute):
+                # only allow numpy ufuncs
+                if not (isinstance(node.value, ast.Name) and
+                        node.value.id == 'numpy' and
+                        isinstance(getattr(numpy, node.attr, None),
+                                   numpy.ufunc)):
+                    return False
+            elif isinstance(node, ast.Call):
+                if node.keywords:
+                    return False
+            elif not isinstance(node, nodes):
+                return False
+        return has_data
 
     def transform(self, in_frame, out_frame):
         self.update_config()
         func = self.config['func']
         data = in_frame.as_numpy()
         out_frame.data = eval(func)
-        audit = out_frame.metadata.get('audit')
-        audit += 'data = %s\n' % func
-        out_frame.metadata.set('audit', audit)
+        audit = 'data = %s\n' % func
+        out_frame.metadata.extend_audit(audit)
         return True
@@ -37,13 +37,22 @@ class ExtractComps(Transformer):
         self.config['start'] = ConfigInt(min_value=0)
         self.config['stop'] = ConfigInt(min_value=1)
 
+    def elementwise(self, in_frame, out_frame):
+        """Get a function to extract components from part of a frame.
+
+        """
+        self.update_config()
+        start = self.config['start']
+        stop = self.config['stop']
+        out_frame.metadata.extend_audit('data = data[%d:%d]\n' % (start, stop))
+        return lambda data: data[:, :, start:stop]
+
     def transform(self, in_frame, out_frame):
         self.update_config()
         start = self.config['start']
         stop = self.config['stop']
         in_data = in_frame.as_numpy()
         out_frame.data = in_data[:,:,start:stop]
-        audit = out_frame.metadata.get('audit')
-        audit += 'data = data[%d:%d]\n' % (start, stop)
-        out_frame.metadata.set('audit', audit)
+        audit = 'data = data[%d:%d]\n' % (start, stop)
+        out_frame.metadata.extend_audit(audit)
         return True
@@ -58,14 +58,24 @@ class Matrix(Transformer):
         self.matrix_coefs = matrix
         return True
 
+    def vertical_support(self):
+        """Each output pixel only depends on the same input pixel.
+
+        See :py:mod:`pyctools.core.stripes`.
+
+        """
+        return 0, 0
+
     def transform(self, in_frame, out_frame):
         if not self.get_matrix():
             return False
         data_in = in_frame.as_numpy()
-        out_frame.data = numpy.dot(data_in, self.matrix_coefs.T)
-        audit = out_frame.metadata.get('audit')
-        audit += 'data = Matrix(data)\n'
-        audit += '    matrix: {\n%s}\n' % (
-            self.matrix_frame.metadata.get('audit'))
-        out_frame.metadata.set('audit', audit)
+        out_data = self.array_pool.get(
+            data_in.shape[:-1] + self.matrix_coefs.shape[:1],
+            numpy.result_type(data_in, self.matrix_coefs))
+        numpy.dot(data_in, self.matrix_coefs.T, out=out_data)
+        out_frame.data = out_data
+        out_frame.metadata.extend_audit(
+            'data = Matrix(data)\n    matrix: {\n',
+            self.matrix_frame.metadata.get_audit(), '}\n')
         return True
@@ -50,35 +50,90 @@ class RGBtoY(Transformer):
         self.config['matrix'] = ConfigEnum(('auto', '601', '709'), dynamic=True)
         self.config['range'] = ConfigEnum(('studio', 'computer'), dynamic=True)
         self.last_frame_type = None
+        self.frame_height = None
 
-    def transform(self, in_frame, out_frame):
+    def setup(self, in_frame, RGB):
         self.update_config()
-        # check input and get data
-        RGB = in_frame.as_numpy()
+        # check input
         if RGB.shape[2] != 3:
             self.logger.critical('Cannot convert %s images with %d components',
                                  in_frame.type, RGB.shape[2])
-            return False
+            return None
         if in_frame.type != 'RGB' and in_frame.type != self.last_frame_type:
             self.logger.warning('Expected RGB input, got %s', in_frame.type)
         self.last_frame_type = in_frame.type
-        audit = out_frame.metadata.get('audit')
-        audit += 'data = RGBtoY(data)\n'
-        # offset or scale
-        if self.config['range'] == 'studio':
-            RGB = RGB - pt_float(16.0)
-        else:
-            RGB = RGB * pt_float(219.0 / 255.0)
-        # matrix to Y
+        ylen = self.frame_height or RGB.shape[0]
+        audit = 'data = RGBtoY(data)\n'
         audit += '    range: %s' % (self.config['range'])
         if (self.config['matrix'] == '601' or
-                (self.config['matrix'] == 'auto' and RGB.shape[0] <= 576)):
+                (self.config['matrix'] == 'auto' and ylen <= 576)):
             matrix = self.mat_601
             audit += ', matrix: 601\n'
         else:
             matrix = self.mat_709
             audit += ', matrix: 709\n'
-        out_frame.data = numpy.dot(RGB, matrix.T) + pt_float(16.0)
+        return matrix, audit
+
+    def elementwise(self, in_frame, out_frame):
+        """Get a function to convert part of a frame.
+
+        :return: The function, or ``None`` if the input can't be
+            converted.
+
+        """
+        setup = self.setup(in_frame, in_frame.as_numpy())
+        if not setup:
+            return None
+        matrix, audit = setup
+        out_frame.type = 'Y'
+        out_frame.metadata.extend_audit(audit)
+        if self.config['range'] == 'studio':
+            def convert(RGB):
+                RGB = numpy.subtract(RGB, pt_float(16.0), dtype=pt_float)
+                return numpy.dot(RGB, matrix.T) + pt_float(16.0)
+        else:
+            def convert(RGB):
+                RGB = numpy.multiply(
+                    RGB, pt_float(219.0 / 255.0), dtype=pt_float)
+                return numpy.dot(RGB, matrix.T) + pt_float(16.0)
+        return convert
+
+    def vertical_support(self):
+        """Each output pixel only depends on the same input pixel.
+
+        See :py:mod:`pyctools.core.stripes`.
+
+        """
+        return 0, 0
+
+    def set_frame_height(self, ylen):
+        """Set the height of the whole frame, when processing a stripe
+        of it. This is used by ``'auto'`` matrix selection.
+
+        See :py:mod:`pyctools.core.stripes`.
+
+        """
+        self.frame_height = ylen
+
+    def transform(self, in_frame, out_frame):
+        RGB = in_frame.as_numpy()
+        setup = self.setup(in_frame, RGB)
+        if not setup:
+            return False
+        matrix, audit = setup
+        # offset or scale
+        scaled = self.array_pool.get(RGB.shape, pt_float)
+        if self.config['range'] == 'studio':
+            numpy.subtract(RGB, pt_float(16.0), out=scaled, dtype=pt_float)
+        else:
+            numpy.multiply(
+                RGB, pt_float(219.0 / 255.0), out=scaled, dtype=pt_float)
+        RGB = scaled
+        # matrix to Y
+        Y_data = self.array_pool.get(RGB.shape[:2] + (1,), pt_float)
+        numpy.dot(RGB, matrix.T, out=Y_data)
+        Y_data += pt_float(16.0)
+        out_frame.data = Y_data
         out_frame.type = 'Y'
-        out_frame.metadata.set('audit', audit)
+        out_frame.metadata.extend_audit(audit)
         return True
@@ -84,15 +84,16 @@ class RGBtoYUV(Component):
         if in_frame.type != 'RGB' and in_frame.type != self.last_frame_type:
             self.logger.warning('Expected RGB input, got %s', in_frame.type)
         self.last_frame_type = in_frame.type
-        Y_audit = Y_frame.metadata.get('audit')
-        Y_audit += 'data = RGBtoY(data)\n'
-        UV_audit = UV_frame.metadata.get('audit')
-        UV_audit += 'data = RGBtoUV(data)\n'
+        Y_audit = 'data = RGBtoY(data)\n'
+        UV_audit = 'data = RGBtoUV(data)\n'
         # offset or scale
+        scaled = self.array_pool.get(RGB.shape, pt_float)
         if self.config['range'] == 'studio':
-            RGB = RGB - pt_float(16.0)
+            numpy.subtract(RGB, pt_float(16.0), out=scaled, dtype=pt_float)
         else:
-            RGB = RGB * pt_float(219.0 / 255.0)
+            numpy.multiply(
+                RGB, pt_float(219.0 / 255.0), out=scaled, dtype=pt_float)
+        RGB = scaled
         # matrix to YUV
         Y_audit += '    range: %s' % (self.config['range'])
         UV_audit += '    range: %s' % (self.config['range'])
@@ -105,10 +106,15 @@ class RGBtoYUV(Component):
             matrix = self.mat_709
             Y_audit += ', matrix: 709\n'
             UV_audit += ', matrix: 709\n'
-        Y_frame.data = numpy.dot(RGB, matrix[0:1].T) + pt_float(16.0)
-        UV_frame.data = numpy.dot(RGB, matrix[1:3].T)
+        Y_data = self.array_pool.get(RGB.shape[:2] + (1,), pt_float)
+        numpy.dot(RGB, matrix[0:1].T, out=Y_data)
+        Y_data += pt_float(16.0)
+        UV_data = self.array_pool.get(RGB.shape[:2] + (2,), pt_float)
+        numpy.dot(RGB, matrix[1:3].T, out=UV_data)
+        Y_frame.data = Y_data
+        UV_frame.data = UV_data
         Y_frame.type = 'Y'
         UV_frame.type = 'CbCr'
-        Y_frame.metadata.set('audit', Y_audit)
-        UV_frame.metadata.set('audit', UV_audit)
+        Y_frame.metadata.extend_audit(Y_audit)
+        UV_frame.metadata.extend_audit(UV_audit)
         return True
@@ -49,6 +49,7 @@ import numpy
 
 from pyctools.core.config import ConfigEnum
 from pyctools.core.base import Component
+from pyctools.core.frame import Audit
 from pyctools.core.types import pt_float
 from pyctools.components.interp.resize import resize_frame
 
@@ -72,6 +73,7 @@ class YUVtoRGB(Component):
         self.config['matrix'] = ConfigEnum(('auto', '601', '709'), dynamic=True)
         self.config['range'] = ConfigEnum(('studio', 'computer'), dynamic=True)
         self.last_frame_type = None
+        self.frame_height = None
 
     def process_frame(self):
         Y_frame = self.input_buffer['input_Y'].get()
@@ -85,6 +87,24 @@ class YUVtoRGB(Component):
             self.stop()
             return
 
+    def vertical_support(self):
+        """Vertical interpolation of UV uses 2 lines above and below,
+        which is 8 Y lines with up to 4:1 vertical subsampling.
+
+        See :py:mod:`pyctools.core.stripes`.
+
+        """
+        return 8, 8
+
+    def set_frame_height(self, ylen):
+        """Set the height of the whole frame, when processing a stripe
+        of it. This is used by ``'auto'`` matrix selection.
+
+        See :py:mod:`pyctools.core.stripes`.
+
+        """
+        self.frame_height = ylen
+
     def transform(self, Y_frame, UV_frame, out_frame):
         self.update_config()
         # check input and get data
@@ -96,11 +116,10 @@ class YUVtoRGB(Component):
         if UV_data.shape[2] != 2:
             self.logger.critical('UV input has %d components', UV_data.shape[2])
             return False
-        audit = 'Y = {\n%s}\n' % Y_frame.metadata.get('audit')
-        audit += 'UV = {\n%s}\n' % UV_frame.metadata.get('audit')
-        audit += 'data = YUVtoRGB(Y, UV)\n'
         # apply offset
-        Y_data = Y_data - pt_float(16.0)
+        YUV = self.array_pool.get(Y_data.shape[:2] + (3,), pt_float)
+        numpy.subtract(
+            Y_data, pt_float(16.0), out=YUV[:, :, 0:1], dtype=pt_float)
         # resample U & V
         v_ss = Y_data.shape[0] // UV_data.shape[0]
         h_ss = Y_data.shape[1] // UV_data.shape[1]
@@ -113,16 +132,19 @@ class YUVtoRGB(Component):
             UV_data = cv2.resize(
                 UV_data, None, fx=1, fy=v_ss, interpolation=cv2.INTER_CUBIC)
         # matrix to RGB
+        ylen = self.frame_height or Y_data.shape[0]
+        audit = 'data = YUVtoRGB(Y, UV)\n'
         audit += '    range: %s' % (self.config['range'])
         if (self.config['matrix'] == '601' or
-                (self.config['matrix'] == 'auto' and Y_data.shape[0] <= 576)):
+                (self.config['matrix'] == 'auto' and ylen <= 576)):
             matrix = self.mat_601
             audit += ', matrix: 601\n'
         else:
             matrix = self.mat_709
             audit += ', matrix: 709\n'
-        YUV = numpy.dstack((Y_data, UV_data))
-        RGB = numpy.dot(YUV, matrix.T)
+        YUV[:, :, 1:3] = UV_data
+        RGB = self.array_pool.get(YUV.shape, pt_float)
+        numpy.dot(YUV, matrix.T, out=RGB)
         # offset or scale
         if self.config['range'] == 'studio':
             RGB += pt_float(16.0)
@@ -130,5 +152,7 @@ class YUVtoRGB(Component):
             RGB *= pt_float(255.0 / 219.0)
         out_frame.data = RGB
         out_frame.type = 'RGB'
-        out_frame.metadata.set('audit', audit)
+        out_frame.metadata.set_audit(Audit.join(
+            'Y = {\n', Y_frame.metadata.get_audit(), '}\n',
+            'UV = {\n', UV_frame.metadata.get_audit(), '}\n', audit))
         return True
@@ -65,9 +65,8 @@ class HalfSize(Component):
         out_frame = self.outframe_pool['output'].get()
         out_frame.initialise(in_frame)
         in_data = in_frame.as_numpy()
-        audit = out_frame.metadata.get('audit')
-        audit += 'data = HalfSizeDeinterlace(data)\n'
-        out_frame.metadata.set('audit', audit)
+        audit = 'data = HalfSizeDeinterlace(data)\n'
+        out_frame.metadata.extend_audit(audit)
         out_frame.frame_no = in_frame.frame_no * 2
         if self.first_field:
             out_frame.data = in_data[0::2]
@@ -86,9 +85,8 @@ class HalfSize(Component):
         out_frame = self.outframe_pool['output'].get()
         out_frame.initialise(in_frame)
         second_field_data = in_frame.as_numpy()
-        audit = out_frame.metadata.get('audit')
-        audit += 'data = HalfSizeReinterlace(data)\n'
-        out_frame.metadata.set('audit', audit)
+        audit = 'data = HalfSizeReinterlace(data)\n'
+        out_frame.metadata.extend_audit(audit)
         out_frame.frame_no = in_frame.frame_no // 2
         out_frame.data = numpy.empty(
             [self.first_field_data.shape[0] + second_field_data.shape[0]] +
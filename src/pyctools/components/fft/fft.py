@@ -91,10 +91,9 @@ class FFT(Transformer):
         if out_type == 'real':
             out_data = numpy.real(out_data)
             operation = 'real(%s)' % operation
-        audit = out_frame.metadata.get('audit')
-        audit += 'data = %s\n' % operation
+        audit = 'data = %s\n' % operation
         audit += '    tile size: %d x %d\n' % (y_tile, x_tile)
-        out_frame.metadata.set('audit', audit)
+        out_frame.metadata.extend_audit(audit)
         out_frame.data = out_data
         out_frame.type = 'FT'
         return True
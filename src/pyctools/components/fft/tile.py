@@ -59,11 +59,10 @@ class Tile(Transformer):
         y_tile = self.config['ytile']
         x_off = self.config['xoff']
         y_off = self.config['yoff']
-        audit = out_frame.metadata.get('audit')
-        audit += 'data = Tile(data)\n'
+        audit = 'data = Tile(data)\n'
         audit += '    size: %d x %d, offset: %d x %d\n' % (
             y_tile, x_tile, y_off, x_off)
-        out_frame.metadata.set('audit', audit)
+        out_frame.metadata.extend_audit(audit)
         data = in_frame.as_numpy()
         tile_params = eval(out_frame.metadata.get('tile', '[]'))
         tile_params.append(
@@ -112,11 +111,10 @@ class UnTile(Transformer):
             return False
         y_tile, x_tile, y_off, x_off, height, width = tile_params.pop()
         out_frame.metadata.set('tile', repr(tile_params))
-        audit = out_frame.metadata.get('audit')
-        audit += 'data = UnTile(data)\n'
+        audit = 'data = UnTile(data)\n'
         audit += '    size: %d x %d, offset: %d x %d\n' % (
             y_tile, x_tile, y_off, x_off)
-        out_frame.metadata.set('audit', audit)
+        out_frame.metadata.extend_audit(audit)
         x_mgn = (x_tile - 1) // x_off
         y_mgn = (y_tile - 1) // y_off
         x_blk = data.shape[1] // x_tile
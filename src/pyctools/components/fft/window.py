@@ -193,8 +193,7 @@ def Window2D(name, x_tile, y_tile, function_1D, x_params={}, y_params={}):
     out_frame = Frame()
     out_frame.data = result
     out_frame.type = 'win'
-    audit = out_frame.metadata.get('audit')
-    audit += 'data = %sWindow()\n' % name
+    audit = 'data = %sWindow()\n' % name
     audit += '    size: %d x %d\n' % (y_tile, x_tile)
     extras = []
     for key, value in x_params.items():
@@ -206,7 +205,7 @@ def Window2D(name, x_tile, y_tile, function_1D, x_params={}, y_params={}):
         extras.append('%s: %s' % (key, str(value)))
     if extras:
         audit += '    vert params: %s\n' % (', '.join(extras))
-    out_frame.metadata.set('audit', audit)
+    out_frame.metadata.extend_audit(audit)
     return out_frame
 
 
@@ -304,12 +303,11 @@ class InverseWindow(Component):
         self.window(in_frame)
         out_frame = Frame()
         out_frame.initialise(in_frame)
-        audit = out_frame.metadata.get('audit')
-        audit += 'data = InverseWindow(data)\n'
+        audit = 'data = InverseWindow(data)\n'
         audit += '    size: %d x %d, offset: %d x %d\n' % (
             y_tile, x_tile, y_off, x_off)
         audit += '    fade: %s\n' % fade
-        out_frame.metadata.set('audit', audit)
+        out_frame.metadata.extend_audit(audit)
 
         in_data = in_frame.as_numpy(dtype=numpy.float32)
         result = numpy.empty(in_data.shape, dtype=numpy.float32)
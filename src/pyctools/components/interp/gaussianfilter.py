@@ -151,13 +151,12 @@ def GaussianFilterCore(x_sigma=0.0, y_sigma=0.0):
     out_frame = Frame()
     out_frame.data = result
     out_frame.type = 'fil'
-    audit = out_frame.metadata.get('audit')
-    audit += 'data = GaussianFilter()\n'
+    audit = 'data = GaussianFilter()\n'
     if x_sigma != 0.0:
         audit += '    x_sigma: %g\n' % (x_sigma)
     if y_sigma != 0.0:
         audit += '    y_sigma: %g\n' % (y_sigma)
-    out_frame.metadata.set('audit', audit)
+    out_frame.metadata.extend_audit(audit)
     return out_frame
 
 def main():
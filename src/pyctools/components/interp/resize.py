@@ -39,14 +39,14 @@ __docformat__ = 'restructuredtext en'
 
 import sys
 if 'sphinx' in sys.modules:
-    __all__.append('resize_frame')
+    __all__ += ['resize_frame', 'resize_shape']
 
 from guild.actor import *
 import numpy
 
 from pyctools.core.config import ConfigInt
 from pyctools.core.base import Transformer
-from .resizecore import resize_frame
+from .resizecore import resize_frame, resize_shape
 
 class Resize(Transformer):
     """Resize (or just filter) an image using user supplied filter(s).
@@ -109,15 +109,18 @@ class Resize(Transformer):
                 self.logger.warning('Mismatch between %d filters and %d images',
                                     self.fil_count, in_data.shape[2])
         norm_filter = self.filter_coefs * numpy.float32(x_up * y_up)
+        ylen_out, xlen_out = resize_shape(
+            in_data.shape[0], in_data.shape[1], x_up, x_down, y_up, y_down)
+        out_data = self.array_pool.get(
+            (ylen_out, xlen_out, in_data.shape[2]), numpy.float32)
         out_frame.data = resize_frame(
-            in_data, norm_filter, x_up, x_down, y_up, y_down)
-        audit = out_frame.metadata.get('audit')
-        audit += 'data = Resize(data)\n'
+            in_data, norm_filter, x_up, x_down, y_up, y_down, out=out_data)
+        audit = 'data = Resize(data)\n'
         if x_up != 1 or x_down != 1:
             audit += '    x_up: %d, x_down: %d\n' % (x_up, x_down)
         if y_up != 1 or y_down != 1:
             audit += '    y_up: %d, y_down: %d\n' % (y_up, y_down)
-        audit += '    filter: {\n%s}\n' % (
-            self.filter_frame.metadata.get('audit'))
-        out_frame.metadata.set('audit', audit)
+        out_frame.metadata.extend_audit(
+            audit, '    filter: {\n', self.filter_frame.metadata.get_audit(),
+            '}\n')
         return True
@@ -155,7 +155,8 @@ cdef void resize_frame_core(DTYPE_t[:, :, :] out_frame,
 
 def resize_frame(numpy.ndarray[DTYPE_t, ndim=3] in_frame,
                  numpy.ndarray[DTYPE_t, ndim=3] norm_filter,
-                 int x_up, int x_down, int y_up, int y_down):
+                 int x_up, int x_down, int y_up, int y_down,
+                 numpy.ndarray[DTYPE_t, ndim=3] out=None):
     """Filter and resize a single 3-D :py:class:`numpy.ndarray`.
 
     The filter should be "normalised" so that the coefficients in each
@@ -175,22 +176,45 @@ def resize_frame(numpy.ndarray[DTYPE_t, ndim=3] in_frame,
 
     :param int y_down: Vertical down-conversion factor.
 
+    :param numpy.ndarray out: Array to store the result in. If
+        ``None`` a new array is created. See :py:func:`resize_shape`
+        for the required shape.
+
     :return: A :py:class:`numpy.ndarray` object containing the new
         image.
 
     """
     cdef:
-        int xlen_in, ylen_in, comps
+        int comps
         int xlen_out, ylen_out
         numpy.ndarray[DTYPE_t, ndim=3] out_frame
-    xlen_in = in_frame.shape[1]
-    ylen_in = in_frame.shape[0]
     comps = in_frame.shape[2]
-    xlen_out = ((xlen_in * x_up) + (x_down // 2)) // x_down
-    ylen_out = ((ylen_in * y_up) + (y_down // 2)) // y_down
-    xlen_out = max(xlen_out, 1)
-    ylen_out = max(ylen_out, 1)
-    out_frame = np.zeros(([ylen_out, xlen_out, comps]), dtype=DTYPE)
+    ylen_out, xlen_out = resize_shape(
+        in_frame.shape[0], in_frame.shape[1], x_up, x_down, y_up, y_down)
+    if out is None:
+        out_frame = np.zeros(([ylen_out, xlen_out, comps]), dtype=DTYPE)
+    else:
+        if (out.shape[0] != ylen_out or out.shape[1] != xlen_out or
+                out.shape[2] != comps):
+            raise ValueError('Output array has wrong shape')
+        # output is accumulated so must start at zero
+        out.fill(0.0)
+        out_frame = out
     resize_frame_core(
         out_frame, in_frame, norm_filter, x_up, x_down, y_up, y_down)
     return out_frame
+
+def resize_shape(int ylen_in, int xlen_in,
+                 int x_up, int x_down, int y_up, int y_down):
+    """Compute the size of a resized image.
+
+    :return: Output height and width.
+
+    :rtype: :py:class:`int`, :py:class:`int`
+
+    """
+    cdef:
+        int xlen_out, ylen_out
+    xlen_out = ((xlen_in * x_up) + (x_down // 2)) // x_down
+    ylen_out = ((ylen_in * y_up) + (y_down // 2)) // y_down
+    return max(ylen_out, 1), max(xlen_out, 1)
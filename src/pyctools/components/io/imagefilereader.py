@@ -17,13 +17,36 @@
 #  along with this program.  If not, see
 #  <http://www.gnu.org/licenses/>.
 
-"""Read still image file (jpg, png, ppm, etc.).
+"""Read still image files (jpg, png, ppm, etc.).
 
-===========  ===  ====
+This component reads a single image file, or a numbered sequence of
+image files, using :py:func:`PIL.Image.open`.
+
+If ``path`` is not an existing file and contains a ``printf`` style
+number format (e.g. ``'frame%04d.png'``) or ``glob`` wildcard
+characters (e.g. ``'frame*.png'``) the component reads a sequence of
+files. Printf style sequences start at 0 (or 1 if there is no file 0)
+and end at the first missing number. Wildcard matches are read in
+sorted order. Files are decoded by a pool of ``workers`` threads, up
+to ``prefetch`` files ahead of the frame being sent, and the frames
+are sent in order with consecutive frame numbers. The metadata of a
+sequence is read once, from a sidecar file for the whole sequence
+(``path`` with ``.xmp`` appended, as written by
+:py:class:`~.imagefilewriter.ImageFileWriter`) if there is one, or
+else from the first file.
+
+Setting ``cache`` to a non-zero size (in MiB) keeps decoded images in
+a shared :py:class:`~pyctools.core.framecache.FrameCache`, so files
+aren't decoded again the next time the component is run.
+
+============  ===  ====
 Config
-===========  ===  ====
-``path``     str  Path name of file to be read.
-===========  ===  ====
+============  ===  ====
+``path``      str  Path name of file to be read, or pattern of a sequence of files.
+``cache``     int  Size (MiB) of shared frame cache to use. Zero disables caching.
+``workers``   int  Number of threads decoding a sequence.
+``prefetch``  int  Number of files to decode ahead.
+============  ===  ====
 
 """
 
@@ -32,39 +55,127 @@ from __future__ import print_function
 __all__ = ['ImageFileReader']
 __docformat__ = 'restructuredtext en'
 
-import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import glob
+import os
 
 import PIL.Image
 
-from pyctools.core.config import ConfigPath
+from pyctools.core.config import ConfigPath, ConfigInt
 from pyctools.core.base import Component
-from pyctools.core.frame import Frame
+from pyctools.core.frame import Metadata
+from pyctools.core.framecache import FrameCache
 
 class ImageFileReader(Component):
     inputs = []
+    with_outframe_pool = True
 
     def initialise(self):
+        self.executor = None
         self.config['path'] = ConfigPath()
+        self.config['cache'] = ConfigInt(min_value=0)
+        self.config['workers'] = ConfigInt(min_value=1, value=4)
+        self.config['prefetch'] = ConfigInt(min_value=1, value=8)
+
+    def find_files(self, path):
+        """Get the file names matching a sequence pattern.
+
+        :return: Sorted list of file names.
 
-    def gen_process(self):
-        # wait for self.output to be connected
-        while self.output.__self__ == self:
-            yield 1
-            time.sleep(0.01)
-        # read file
+        """
+        if os.path.exists(path):
+            return [path]
+        if any(c in path for c in '*?['):
+            return sorted(glob.glob(path))
+        if '%' not in path:
+            return [path]
+        try:
+            path % 0
+        except (TypeError, ValueError):
+            return [path]
+        n = 0
+        if not os.path.exists(path % n):
+            n = 1
+        result = []
+        while os.path.exists(path % n):
+            result.append(path % n)
+            n += 1
+        return result
+
+    def process_start(self):
+        super(ImageFileReader, self).process_start()
         self.update_config()
         path = self.config['path']
-        out_frame = Frame()
-        image = PIL.Image.open(path)
-        # send output frame
+        self.paths = self.find_files(path)
+        if not self.paths:
+            self.logger.critical('No files match %s', path)
+        # read metadata once, not per file
+        md_path = path
+        if self.paths != [path] and not os.path.exists(path + '.xmp'):
+            md_path = (self.paths or [path])[0]
+        self.metadata = Metadata().from_file(md_path)
+        audit = 'data = %s\n' % path
+        self.metadata.extend_audit(audit)
+        self.executor = ThreadPoolExecutor(self.config['workers'])
+        self.pending = deque()
+        self.next_path = 0
+        self.frame_no = 0
+        self.queue_reads()
+
+    def queue_reads(self):
+        """Start decoding files, up to ``prefetch`` ahead."""
+        while (len(self.pending) < self.config['prefetch'] and
+               self.next_path < len(self.paths)):
+            self.pending.append(self.executor.submit(
+                self.read_image, self.paths[self.next_path]))
+            self.next_path += 1
+
+    def read_image(self, path):
+        """Open and decode a file. This is run by a worker thread."""
+        if not self.config['cache']:
+            image = PIL.Image.open(path)
+            image.load()
+            return image
+        cache = FrameCache.shared()
+        cache.reserve(self.config['cache'] * 2**20)
+        stat = os.stat(path)
+        cache_key = (path, stat.st_mtime, stat.st_size)
+        image = cache.get(cache_key)
+        if image is None:
+            image = PIL.Image.open(path)
+            image.load()
+            cache.put(cache_key, image, nbytes=(
+                image.size[0] * image.size[1] * len(image.getbands())))
+        return image
+
+    def process_frame(self):
+        if not self.pending:
+            # shut down pipeline
+            self.output(None)
+            self.stop()
+            return
+        future = self.pending.popleft()
+        self.queue_reads()
+        try:
+            image = future.result()
+        except Exception as ex:
+            self.logger.exception(ex)
+            self.output(None)
+            self.stop()
+            return
+        out_frame = self.outframe_pool['output'].get()
         out_frame.data = image
         out_frame.type = image.mode
-        out_frame.frame_no = 0
-        out_frame.metadata.from_file(path)
-        audit = out_frame.metadata.get('audit')
-        audit += 'data = %s\n' % path
-        out_frame.metadata.set('audit', audit)
+        out_frame.frame_no = self.frame_no
+        self.frame_no += 1
+        out_frame.metadata.copy(self.metadata)
         self.output(out_frame)
-        # shut down pipeline
-        self.output(None)
-        self.stop()
+
+    def onStop(self):
+        super(ImageFileReader, self).onStop()
+        if self.executor:
+            for future in self.pending:
+                future.cancel()
+            self.executor.shutdown()
+            self.executor = None
@@ -17,39 +17,141 @@
 #  along with this program.  If not, see
 #  <http://www.gnu.org/licenses/>.
 
-"""Save still image file.
+"""Save still image files.
 
 This is a "pass through" component that can be inserted anywhere in a
 pipeline. It saves the first frame it receives to file using
 :py:meth:`PIL.Image.Image.save`.
 
+If ``path`` contains a ``printf`` style number format (e.g.
+``'frame%04d.png'``) every frame is saved, to a file named with the
+frame's number. Conversion to 8-bit and image encoding / compression
+are done by a pool of ``workers`` threads, so they don't hold up the
+pipeline. At most two frames per worker are queued before the
+component waits for the oldest to be written. (A single file is
+written before the frame is passed on, and an error stops the
+pipeline.)
+
+The metadata (audit trail) is written to a single sidecar file, named
+by appending ``.xmp`` to ``path``, when the first frame is received.
+:py:class:`~.imagefilereader.ImageFileReader` reads this file when
+reading the sequence.
+
+The ``compression`` value is used when saving PNG files (``zlib``
+level, 0 to 9) or TIFF files (0 is no compression, any other value
+selects ``deflate`` compression). Other file formats use PIL's default
+settings.
+
+===============  ===  ====
+Config
+===============  ===  ====
+``path``         str  Path name of file to be written, or pattern of a sequence of files.
+``compression``  int  PNG or TIFF compression level.
+``workers``      int  Number of threads encoding a sequence.
+===============  ===  ====
+
 """
 
-import PIL.Image
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import os
 
 __all__ = ['ImageFileWriter']
 __docformat__ = 'restructuredtext en'
 
-from pyctools.core.config import ConfigPath
-from pyctools.core.frame import Metadata
+from pyctools.core.config import ConfigPath, ConfigInt
+from pyctools.core.frame import Frame, Metadata
 from pyctools.core.base import Transformer
 
 class ImageFileWriter(Transformer):
     def initialise(self):
         self.done = False
+        self.executor = None
+        self.pending = deque()
         self.config['path'] = ConfigPath()
+        self.config['compression'] = ConfigInt(
+            min_value=0, max_value=9, value=6)
+        self.config['workers'] = ConfigInt(min_value=1, value=4)
 
     def transform(self, in_frame, out_frame):
         if self.done:
             return True
         self.update_config()
         path = self.config['path']
-        image = in_frame.as_PIL()
-        image.save(path)
-        md = Metadata().copy(in_frame.metadata)
-        audit = md.get('audit')
-        audit += '%s = data\n' % path
-        md.set('audit', audit)
-        md.to_file(path)
-        self.done = True
+        sequence = self.is_sequence(path)
+        if not self.executor:
+            # first frame, write metadata for whole sequence
+            md = Metadata().copy(in_frame.metadata)
+            audit = '%s = data\n' % path
+            md.extend_audit(audit)
+            md.to_file(path)
+            self.executor = ThreadPoolExecutor(self.config['workers'])
+        if sequence:
+            file_path = path % in_frame.frame_no
+        else:
+            file_path = path
+            self.done = True
+        # limit number of frames held in queue
+        while len(self.pending) >= self.config['workers'] * 2:
+            self.wait_oldest()
+        future = self.executor.submit(
+            self.save, in_frame.data, file_path, self.save_params(path))
+        if sequence:
+            self.pending.append(future)
+            return True
+        # single file, wait for it to be saved
+        try:
+            future.result()
+        except Exception as ex:
+            self.logger.exception(ex)
+            return False
         return True
+
+    @staticmethod
+    def is_sequence(path):
+        """Does a path name include a ``printf`` style number format.
+
+        """
+        if '%' not in path:
+            return False
+        try:
+            path % 0
+        except (TypeError, ValueError):
+            return False
+        return True
+
+    def save_params(self, path):
+        """Get file format specific keyword arguments for
+        :py:meth:`PIL.Image.Image.save`.
+
+        """
+        ext = os.path.splitext(path)[1].lower()
+        level = self.config['compression']
+        if ext == '.png':
+            return {'compress_level': level}
+        if ext in ('.tif', '.tiff'):
+            if level:
+                return {'compression': 'tiff_deflate'}
+            return {'compression': 'raw'}
+        return {}
+
+    def save(self, data, path, params):
+        """Convert and save one image. This is run by a worker thread."""
+        frame = Frame()
+        frame.data = data
+        frame.as_PIL().save(path, **params)
+
+    def wait_oldest(self):
+        future = self.pending.popleft()
+        try:
+            future.result()
+        except Exception as ex:
+            self.logger.exception(ex)
+
+    def onStop(self):
+        super(ImageFileWriter, self).onStop()
+        while self.pending:
+            self.wait_oldest()
+        if self.executor:
+            self.executor.shutdown()
+            self.executor = None
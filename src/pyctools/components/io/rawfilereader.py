@@ -36,16 +36,56 @@ stored in separate planes. The formats are labelled with a four
 character code knows as a `fourcc <http://www.fourcc.org/>`_ code.
 This code needs to be in the metadata file with the image dimensions.
 
+The 8-bit formats ``BGR[24]``, ``RGB[24]``, ``IYU2``, ``UYVY``
+(``UYNV``, ``Y422``, ``HDYC``), ``YVYU``, ``YUYV`` (``YUY2``,
+``YUNV``, ``V422``), ``IYUV`` (``I420``), ``YV12``, ``YV16`` and
+``YVU9`` can be read. So can the 10-bit packed format ``v210`` and the
+16-bit (little-endian) semi-planar formats ``P010``, ``P016``,
+``P210`` and ``P216``. There are no fourcc codes for 10 and 16-bit
+planar formats, so FFmpeg's pixel format names ``yuv420p10le``,
+``yuv422p10le``, ``yuv444p10le``, ``yuv420p16le``, ``yuv422p16le``
+and ``yuv444p16le`` are used instead.
+
 Note that when reading "YUV" formats the U & V outputs are offset by
 128 to restore their range to -128..127 (from the file range of
-0..255). This makes subsequent processing a lot easier.
+0..255). This makes subsequent processing a lot easier. 10 and 16-bit
+data is scaled to the same range as 8-bit data, so the outputs are
+floating point.
+
+The ``start``, ``stop`` and ``step`` config items select a range of
+frames from the file, in the same way as a Python slice. A ``stop``
+value of zero means the end of the file. They can be changed while
+the component is running, allowing a large file to be "scrubbed"
+through. Playback then restarts from the new ``start`` frame.
+
+Setting ``mmap`` to ``'on'`` maps the file into memory instead of
+reading each frame. The ``RGB`` output, or the ``Y`` output from 8-bit
+planar formats, is then a view of the mapped file (with no copying).
+(Other formats are converted in a single pass by multi-threaded Cython
+code.) Moving to any frame takes the same small amount of time. The
+operating system only reads the parts of the file that are used. Set
+``readahead`` to a number of frames to ask the operating system to
+start reading frames before they are needed. (If the operating system
+can't be asked, a thread reads ahead instead when ``mmap`` is
+``'on'``.)
 
-===========  ===  ====
+Setting ``cache`` to a non-zero size (in MiB) keeps unpacked frames in
+a shared :py:class:`~pyctools.core.framecache.FrameCache`, so frames
+that are read again (e.g. when looping) don't need to be read or
+unpacked.
+
+=============  ===  ====
 Config
-===========  ===  ====
-``path``     str  Path name of file to be read.
-``looping``  str  Whether to play continuously. Can be ``'off'``, ``'repeat'`` or ``'reverse'``.
-===========  ===  ====
+=============  ===  ====
+``path``       str  Path name of file to be read.
+``looping``    str  Whether to play continuously. Can be ``'off'``, ``'repeat'`` or ``'reverse'``.
+``start``      int  First frame to read.
+``stop``       int  Stop before this frame. Zero means the end of the file.
+``step``       int  Read one frame in every ``step``.
+``mmap``       str  Map the file into memory. Can be ``'off'`` or ``'on'``.
+``readahead``  int  Number of frames to read ahead.
+``cache``      int  Size (MiB) of shared frame cache to use. Zero disables caching.
+=============  ===  ====
 
 """
 
@@ -53,16 +93,53 @@ __all__ = ['RawFileReader']
 __docformat__ = 'restructuredtext en'
 
 import io
+import mmap
 import os
+import threading
 
 import numpy
 
-from pyctools.core.config import ConfigPath, ConfigEnum
+from pyctools.core.config import ConfigPath, ConfigEnum, ConfigInt
 from pyctools.core.base import Component
 from pyctools.core.frame import Metadata
+from pyctools.core.framecache import FrameCache
 from pyctools.core.types import pt_float
+from .rawfilereadercore import (
+    unpack_packed, unpack_planar_uv, unpack_planar_y, unpack_v210)
 
 class RawFileReader(Component):
+    # packed formats: bytes per UV pair, Y, Y, U & V offsets, h_ss
+    packed_formats = {
+        'IYU2' : (3, 1, -1, 0, 2, 1),
+        'UYVY' : (4, 1, 3, 0, 2, 2),
+        'UYNV' : (4, 1, 3, 0, 2, 2),
+        'Y422' : (4, 1, 3, 0, 2, 2),
+        'HDYC' : (4, 1, 3, 0, 2, 2),
+        'YVYU' : (4, 0, 2, 3, 1, 2),
+        'YUYV' : (4, 0, 2, 1, 3, 2),
+        'YUY2' : (4, 0, 2, 1, 3, 2),
+        'YUNV' : (4, 0, 2, 1, 3, 2),
+        'V422' : (4, 0, 2, 1, 3, 2),
+        }
+    # planar formats: v_ss, h_ss, UV order, bytes per sample, scale,
+    # UV interleaved (semi-planar)
+    planar_formats = {
+        'IYUV'        : (2, 2, 'UV', 1, 1.0,         False),
+        'I420'        : (2, 2, 'UV', 1, 1.0,         False),
+        'YV12'        : (2, 2, 'VU', 1, 1.0,         False),
+        'YV16'        : (1, 2, 'VU', 1, 1.0,         False),
+        'YVU9'        : (4, 4, 'VU', 1, 1.0,         False),
+        'P010'        : (2, 2, 'UV', 2, 1.0 / 256.0, True),
+        'P016'        : (2, 2, 'UV', 2, 1.0 / 256.0, True),
+        'P210'        : (1, 2, 'UV', 2, 1.0 / 256.0, True),
+        'P216'        : (1, 2, 'UV', 2, 1.0 / 256.0, True),
+        'yuv420p10le' : (2, 2, 'UV', 2, 1.0 / 4.0,   False),
+        'yuv422p10le' : (1, 2, 'UV', 2, 1.0 / 4.0,   False),
+        'yuv444p10le' : (1, 1, 'UV', 2, 1.0 / 4.0,   False),
+        'yuv420p16le' : (2, 2, 'UV', 2, 1.0 / 256.0, False),
+        'yuv422p16le' : (1, 2, 'UV', 2, 1.0 / 256.0, False),
+        'yuv444p16le' : (1, 1, 'UV', 2, 1.0 / 256.0, False),
+        }
     inputs = []
     outputs = ['output_Y_RGB', 'output_UV']
     with_outframe_pool = True
@@ -71,6 +148,12 @@ class RawFileReader(Component):
         self.config['path'] = ConfigPath()
         self.config['looping'] = ConfigEnum(
             ('off', 'repeat', 'reverse'), dynamic=True)
+        self.config['start'] = ConfigInt(min_value=0, dynamic=True)
+        self.config['stop'] = ConfigInt(min_value=0, dynamic=True)
+        self.config['step'] = ConfigInt(min_value=1, value=1, dynamic=True)
+        self.config['mmap'] = ConfigEnum(('off', 'on'))
+        self.config['readahead'] = ConfigInt(min_value=0, dynamic=True)
+        self.config['cache'] = ConfigInt(min_value=0)
 
     def process_start(self):
         super(RawFileReader, self).process_start()
@@ -78,9 +161,8 @@ class RawFileReader(Component):
         self.update_config()
         path = self.config['path']
         self.metadata = Metadata().from_file(path)
-        audit = self.metadata.get('audit')
-        audit += 'data = %s\n' % path
-        self.metadata.set('audit', audit)
+        audit = 'data = %s\n' % path
+        self.metadata.extend_audit(audit)
         # create file reader
         self.frame_no = 0
         self.generator = self.file_reader()
@@ -107,128 +189,227 @@ class RawFileReader(Component):
             UV_frame.type = self.UV_type
             self.output_UV(UV_frame)
 
+    def make_unpacker(self, fourcc, xlen, ylen):
+        """Get the size of a frame and a function to convert one
+        frame of raw data to Y (or RGB) and UV arrays.
+
+        :return: ``(bytes_per_frame, unpack)``, or ``None`` if the
+            format is not recognised.
+
+        """
+        array_pool = self.array_pool
+        self.Y_type = 'Y'
+        self.UV_type = 'CbCr'
+        if fourcc in ('BGR[24]', 'RGB[24]'):
+            self.Y_type = 'RGB'
+            if fourcc == 'BGR[24]':
+                order = slice(None, None, -1)
+            else:
+                order = slice(None)
+            def unpack(raw):
+                return raw.reshape(ylen, xlen, 3)[:, :, order], None
+            return xlen * ylen * 3, unpack
+        if fourcc in self.packed_formats:
+            pitch, y_0, y_1, u, v, h_ss = self.packed_formats[fourcc]
+            bytes_per_line = (xlen // h_ss) * pitch
+            def unpack(raw):
+                Y_data = array_pool.get((ylen, xlen, 1), numpy.uint8)
+                UV_data = array_pool.get((ylen, xlen // h_ss, 2), pt_float)
+                unpack_packed(raw.reshape(ylen, bytes_per_line),
+                              Y_data, UV_data, pitch, y_0, y_1, u, v)
+                return Y_data, UV_data
+            return bytes_per_line * ylen, unpack
+        if fourcc == 'v210':
+            # lines are padded to a multiple of 48 pixels
+            words_per_line = ((xlen + 47) // 48) * 32
+            def unpack(raw):
+                Y_data = array_pool.get((ylen, xlen, 1), pt_float)
+                UV_data = array_pool.get((ylen, xlen // 2, 2), pt_float)
+                words = raw.view(numpy.dtype('<u4'))
+                if not words.dtype.isnative:
+                    words = words.astype(numpy.uint32)
+                unpack_v210(words.reshape(ylen, words_per_line),
+                            Y_data, UV_data)
+                return Y_data, UV_data
+            return words_per_line * 4 * ylen, unpack
+        if fourcc not in self.planar_formats:
+            return None
+        v_ss, h_ss, order, sample_bytes, scale, interleaved = (
+            self.planar_formats[fourcc])
+        UV_shape = (ylen // v_ss, xlen // h_ss)
+        Y_size = xlen * ylen
+        UV_size = UV_shape[0] * UV_shape[1]
+        if sample_bytes == 1:
+            dtype = numpy.dtype(numpy.uint8)
+        else:
+            dtype = numpy.dtype('<u2')
+        def unpack(raw):
+            data = raw.view(dtype)
+            if not dtype.isnative:
+                data = data.astype(dtype.newbyteorder('='))
+            Y_data = data[:Y_size].reshape(ylen, xlen, 1)
+            if sample_bytes > 1:
+                Y_plane = Y_data
+                Y_data = array_pool.get((ylen, xlen, 1), pt_float)
+                unpack_planar_y(Y_plane[:, :, 0], Y_data, scale)
+            if interleaved:
+                UV_plane = data[Y_size:].reshape(
+                    UV_shape[0], UV_shape[1] * 2)
+                U_plane, V_plane = UV_plane[:, 0::2], UV_plane[:, 1::2]
+            else:
+                U_plane = data[Y_size:Y_size + UV_size].reshape(UV_shape)
+                V_plane = data[Y_size + UV_size:].reshape(UV_shape)
+            if order == 'VU':
+                U_plane, V_plane = V_plane, U_plane
+            UV_data = array_pool.get(UV_shape + (2,), pt_float)
+            unpack_planar_uv(U_plane, V_plane, UV_data, scale)
+            return Y_data, UV_data
+        return (Y_size + (UV_size * 2)) * sample_bytes, unpack
+
     def file_reader(self):
         """Generator process to read file"""
         self.update_config()
         path = self.config['path']
         fourcc = self.metadata.get('fourcc')
         xlen, ylen = self.metadata.image_size()
-        # set bits per pixel and component dimensions
-        if fourcc in ('BGR[24]',):
-            bpp = 24
-            Y_shape = (ylen, xlen)
-        elif fourcc in ('RGB[24]',):
-            bpp = 24
-            Y_shape = (ylen, xlen, 3)
-        elif fourcc in ('IYU2',):
-            bpp = 24
-            Y_shape = (ylen, xlen, 1)
-            UV_shape = (ylen, xlen)
-        elif fourcc in ('UYVY', 'UYNV', 'Y422', 'HDYC', 'YVYU', 'YUYV',
-                        'YV16', 'YUY2', 'YUNV', 'V422'):
-            bpp = 16
-            Y_shape = (ylen, xlen, 1)
-            UV_shape = (ylen, xlen // 2)
-        elif fourcc in ('IYUV', 'I420', 'YV12'):
-            bpp = 12
-            Y_shape = (ylen, xlen, 1)
-            UV_shape = (ylen // 2, xlen // 2)
-        elif fourcc in ('YVU9',):
-            bpp = 9
-            Y_shape = (ylen, xlen, 1)
-            UV_shape = (ylen // 4, xlen // 4)
-        else:
+        unpacker = self.make_unpacker(fourcc, xlen, ylen)
+        if not unpacker:
             self.logger.critical("Can't open %s files", fourcc)
             return
-        bytes_per_frame = (xlen * ylen * bpp) // 8
+        bytes_per_frame, unpack = unpacker
         zlen = os.path.getsize(path) // bytes_per_frame
         if zlen < 1:
             self.logger.critical("Zero length file %s", path)
             return
-        # set raw array slice parameters
-        if fourcc in ('BGR[24]',):
-            Y_slice = ((2, None, 3), (1, None, 3), (0, None, 3))
-            UV_slice = None
-        elif fourcc in ('RGB[24]',):
-            Y_slice = ((0, None, 1),)
-            UV_slice = None
-        elif fourcc in ('IYU2',):
-            Y_slice = ((1, None, 3),)
-            UV_slice = ((0, None, 3), (2, None, 3))
-        elif fourcc in ('UYVY', 'UYNV', 'Y422', 'HDYC'):
-            # packed format, UYVY order
-            Y_slice = ((1, None, 2),)
-            UV_slice = ((0, None, 4), (2, None, 4))
-        elif fourcc in ('YVYU',):
-            # packed format, YVYU order
-            Y_slice = ((0, None, 2),)
-            UV_slice = ((3, None, 4), (1, None, 4))
-        elif fourcc in ('YUYV', 'YUY2', 'YUNV', 'V422'):
-            # packed format, YUYV order
-            Y_slice = ((0, None, 2),)
-            UV_slice = ((1, None, 4), (3, None, 4))
-        elif fourcc in ('IYUV', 'I420'):
-            # planar format, YUV order
-            Y_size = xlen * ylen
-            UV_size = UV_shape[0] * UV_shape[1]
-            Y_slice = ((0,                Y_size,                 1),)
-            UV_slice = ((Y_size,           Y_size + UV_size,       1),
-                        (Y_size + UV_size, Y_size + (UV_size * 2), 1))
-        elif fourcc in ('YV16', 'YV12', 'YVU9'):
-            # planar format, YVU order
-            Y_size = xlen * ylen
-            UV_size = UV_shape[0] * UV_shape[1]
-            Y_slice = ((0,                Y_size,                 1),)
-            UV_slice = ((Y_size + UV_size, Y_size + (UV_size * 2), 1),
-                        (Y_size,           Y_size + UV_size,       1))
-        else:
-            self.logger.critical("Can't open %s files", fourcc)
-            return
-        # set frame type
-        if fourcc in ('BGR[24]', 'RGB[24]'):
-            self.Y_type = 'RGB'
-        else:
-            self.Y_type = 'Y'
-            self.UV_type = 'CbCr'
-        file_frame = 0
-        direction = 1
+        cache = None
+        if self.config['cache']:
+            cache = FrameCache.shared()
+            cache.reserve(self.config['cache'] * 2**20)
+            stat = os.stat(path)
+            cache_key = (path, stat.st_mtime, stat.st_size, fourcc, xlen, ylen)
         with io.open(path, 'rb', 0) as raw_file:
-            while True:
-                self.update_config()
-                if file_frame >= zlen:
-                    if self.config['looping'] == 'off':
-                        break
-                    elif self.config['looping'] == 'repeat':
-                        file_frame = 0
-                        raw_file.seek(0)
+            if self.config['mmap'] == 'on':
+                file_map = mmap.mmap(
+                    raw_file.fileno(), 0, access=mmap.ACCESS_READ)
+                file_array = numpy.frombuffer(file_map, numpy.uint8)
+            else:
+                file_map = None
+            prefetch = _Prefetcher(raw_file, file_map, bytes_per_frame)
+            frame_range = None
+            try:
+                while True:
+                    self.update_config()
+                    stop = self.config['stop'] or zlen
+                    new_range = range(self.config['start'], min(stop, zlen),
+                                      self.config['step'])
+                    if new_range != frame_range:
+                        # start (again) at beginning of new range
+                        frame_range = new_range
+                        if not frame_range:
+                            self.logger.critical(
+                                'No frames in range %d:%d:%d of %s',
+                                self.config['start'], self.config['stop'],
+                                self.config['step'], path)
+                            return
+                        idx = 0
+                        direction = 1
+                    if idx >= len(frame_range):
+                        if self.config['looping'] == 'off':
+                            break
+                        elif self.config['looping'] == 'repeat':
+                            idx = 0
+                        else:
+                            idx = max(len(frame_range) - 2, 0)
+                            direction = -1
+                    elif idx < 0:
+                        idx = min(1, len(frame_range) - 1)
+                        direction = 1
+                    file_frame = frame_range[idx]
+                    idx += direction
+                    if cache:
+                        data = cache.get(cache_key + (file_frame,))
+                        if data:
+                            yield data
+                            continue
+                    # ask for the next few frames to be read
+                    ahead = []
+                    for n in range(self.config['readahead']):
+                        n = idx + (n * direction)
+                        if n < 0 or n >= len(frame_range):
+                            break
+                        ahead.append(frame_range[n])
+                    prefetch.frames(ahead)
+                    # get raw data as a numpy array
+                    if file_map:
+                        offset = file_frame * bytes_per_frame
+                        raw_array = file_array[offset:offset + bytes_per_frame]
                     else:
-                        file_frame = zlen - 2
-                        direction = -1
-                elif file_frame < 0:
-                    file_frame = 1
-                    direction = 1
-                if direction != 1:
-                    raw_file.seek((direction - 1) * bytes_per_frame, io.SEEK_CUR)
-                file_frame += direction
-                raw_data = raw_file.read(bytes_per_frame)
-                # convert to numpy arrays
-                raw_array = numpy.frombuffer(raw_data, numpy.uint8)
-                Y_data = []
-                for start, end, step in Y_slice:
-                    raw_data = raw_array[start:end:step]
-                    Y_data.append(raw_data.reshape(Y_shape))
-                if len(Y_data) > 1:
-                    Y_data = numpy.dstack(Y_data)
-                else:
-                    Y_data = Y_data[0]
-                if UV_slice:
-                    UV_data = []
-                    for start, end, step in UV_slice:
-                        raw_data = raw_array[start:end:step]
-                        UV_data.append(raw_data.reshape(UV_shape))
-                    UV_data = numpy.dstack(UV_data)
-                    # remove offset
-                    UV_data = UV_data.astype(pt_float) - pt_float(128.0)
-                else:
-                    UV_data = None
-                yield Y_data, UV_data
+                        raw_file.seek(file_frame * bytes_per_frame)
+                        raw_data = raw_file.read(bytes_per_frame)
+                        raw_array = numpy.frombuffer(raw_data, numpy.uint8)
+                    data = unpack(raw_array)
+                    if cache:
+                        cache.put(cache_key + (file_frame,), data)
+                    yield data
+            finally:
+                prefetch.close()
+
+
+class _Prefetcher(object):
+    # Ask the operating system to read parts of a file that will soon
+    # be needed, or read them in a thread if that's not possible.
+    def __init__(self, raw_file, file_map, bytes_per_frame):
+        self.raw_file = raw_file
+        self.file_map = file_map
+        self.bytes_per_frame = bytes_per_frame
+        self.done = set()
+        self.thread = None
+        self.wanted = []
+        self.cond = threading.Condition()
+
+    def frames(self, frames):
+        # don't repeat requests made last time
+        done, self.done = self.done, set(frames)
+        for frame in frames:
+            if frame in done:
+                continue
+            offset = frame * self.bytes_per_frame
+            length = self.bytes_per_frame
+            if self.file_map and hasattr(self.file_map, 'madvise'):
+                # madvise needs a page aligned start
+                align = offset % mmap.PAGESIZE
+                self.file_map.madvise(
+                    mmap.MADV_WILLNEED, offset - align, length + align)
+            elif not self.file_map and hasattr(os, 'posix_fadvise'):
+                os.posix_fadvise(self.raw_file.fileno(), offset, length,
+                                 os.POSIX_FADV_WILLNEED)
+            elif self.file_map:
+                self._queue(offset, length)
+
+    def _queue(self, offset, length):
+        with self.cond:
+            if not self.thread:
+                self.thread = threading.Thread(target=self._touch_pages)
+                self.thread.daemon = True
+                self.thread.start()
+            self.wanted.append((offset, length))
+            self.cond.notify()
+
+    def _touch_pages(self):
+        # read one byte from each page, so the OS loads it
+        data = numpy.frombuffer(self.file_map, numpy.uint8)
+        while True:
+            with self.cond:
+                while not self.wanted:
+                    self.cond.wait()
+                offset, length = self.wanted.pop(0)
+            if offset is None:
+                break
+            data[offset:offset + length:mmap.PAGESIZE].max()
+
+    def close(self):
+        if self.thread:
+            with self.cond:
+                self.wanted = [(None, None)]
+                self.cond.notify()
+            self.thread.join()
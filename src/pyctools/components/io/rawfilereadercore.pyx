@@ -0,0 +1,157 @@
+#  Pyctools - a picture processing algorithm development kit.
+#  http://github.com/jim-easterbrook/pyctools
+#  Copyright (C) 2014  Jim Easterbrook  jim@jim-easterbrook.me.uk
+#
+#  This program is free software: you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation, either version 3 of the
+#  License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#  General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see
+#  <http://www.gnu.org/licenses/>.
+
+"""Cython extension to unpack raw file data.
+
+Each function converts one frame of raw data in a single pass, writing
+to output arrays supplied by the caller. UV outputs have 128 (in 8-bit
+units) subtracted. Outputs from 10 and 16-bit data are scaled to the
+usual 8-bit range.
+
+"""
+
+from cython.parallel import prange
+import numpy as np
+
+cimport cython
+cimport numpy
+
+DTYPE = np.float32
+ctypedef numpy.float32_t DTYPE_t
+
+ctypedef fused word_t:
+    numpy.uint8_t
+    numpy.uint16_t
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def unpack_packed(const numpy.uint8_t[:, ::1] raw,
+                  numpy.uint8_t[:, :, ::1] Y, DTYPE_t[:, :, ::1] UV,
+                  int pitch, int y_0, int y_1, int u, int v):
+    """Unpack 8-bit packed YUV, such as UYVY or IYU2.
+
+    Each group of ``pitch`` bytes holds one U and one V sample at
+    offsets ``u`` and ``v``, and one or two Y samples at offsets
+    ``y_0`` and ``y_1``. Set ``y_1`` to -1 if there is only one Y
+    sample.
+
+    If ``Y`` is wider than the packed data (e.g. 4:2:2 with an odd
+    width) the last Y sample of each line is repeated.
+
+    """
+    cdef:
+        int xlen, ylen, uv_xlen, x, y
+        const numpy.uint8_t* src
+        numpy.uint8_t* Y_dst
+        DTYPE_t* UV_dst
+    xlen = Y.shape[1]
+    ylen = Y.shape[0]
+    uv_xlen = UV.shape[1]
+    if ylen == 0 or uv_xlen == 0:
+        return
+    with nogil:
+        for y in prange(ylen, schedule='static'):
+            src = &raw[y, 0]
+            Y_dst = &Y[y, 0, 0]
+            UV_dst = &UV[y, 0, 0]
+            if y_1 < 0:
+                for x in range(uv_xlen):
+                    Y_dst[x] = src[(x * pitch) + y_0]
+                    UV_dst[x * 2] = src[(x * pitch) + u] - 128.0
+                    UV_dst[(x * 2) + 1] = src[(x * pitch) + v] - 128.0
+            else:
+                for x in range(uv_xlen):
+                    Y_dst[x * 2] = src[(x * pitch) + y_0]
+                    Y_dst[(x * 2) + 1] = src[(x * pitch) + y_1]
+                    UV_dst[x * 2] = src[(x * pitch) + u] - 128.0
+                    UV_dst[(x * 2) + 1] = src[(x * pitch) + v] - 128.0
+                for x in range(uv_xlen * 2, xlen):
+                    Y_dst[x] = Y_dst[(uv_xlen * 2) - 1]
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def unpack_planar_y(const word_t[:, :] plane, DTYPE_t[:, :, :] Y,
+                    DTYPE_t scale):
+    """Convert a plane of Y samples to floating point, multiplying by
+    ``scale``.
+
+    """
+    cdef:
+        int x, y
+    with nogil:
+        for y in prange(Y.shape[0], schedule='static'):
+            for x in range(Y.shape[1]):
+                Y[y, x, 0] = <DTYPE_t>plane[y, x] * scale
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def unpack_planar_uv(const word_t[:, :] U, const word_t[:, :] V,
+                     DTYPE_t[:, :, :] UV, DTYPE_t scale):
+    """Interleave planes (or strided views) of U and V samples,
+    multiplying by ``scale`` and subtracting 128.
+
+    """
+    cdef:
+        int x, y
+    with nogil:
+        for y in prange(UV.shape[0], schedule='static'):
+            for x in range(UV.shape[1]):
+                UV[y, x, 0] = (<DTYPE_t>U[y, x] * scale) - 128.0
+                UV[y, x, 1] = (<DTYPE_t>V[y, x] * scale) - 128.0
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef void v210_line(const numpy.uint32_t[:] raw,
+                    DTYPE_t[:, :] Y, DTYPE_t[:, :] UV) nogil:
+    cdef:
+        int xlen, uv_xlen, blocks, b, x, i
+        numpy.uint32_t w
+        DTYPE_t s[12]
+    xlen = Y.shape[0]
+    uv_xlen = UV.shape[0]
+    blocks = (xlen + 5) // 6
+    for b in range(blocks):
+        # unpack 12 samples: Cb Y Cr Y Cb Y Cr Y Cb Y Cr Y
+        for i in range(4):
+            w = raw[(b * 4) + i]
+            s[i * 3] = <DTYPE_t>(w & 0x3ff) * 0.25
+            s[(i * 3) + 1] = <DTYPE_t>((w >> 10) & 0x3ff) * 0.25
+            s[(i * 3) + 2] = <DTYPE_t>((w >> 20) & 0x3ff) * 0.25
+        for i in range(6):
+            x = (b * 6) + i
+            if x < xlen:
+                Y[x, 0] = s[(i * 2) + 1]
+        for i in range(3):
+            x = (b * 3) + i
+            if x < uv_xlen:
+                UV[x, 0] = s[i * 4] - 128.0
+                UV[x, 1] = s[(i * 4) + 2] - 128.0
+
+def unpack_v210(const numpy.uint32_t[:, :] raw,
+                DTYPE_t[:, :, :] Y, DTYPE_t[:, :, :] UV):
+    """Unpack 10-bit 4:2:2 "v210" data.
+
+    Each line is a sequence of 4 word (16 byte) blocks, each holding 6
+    pixels. ``raw`` is indexed by line and 32-bit (little-endian) word.
+
+    """
+    cdef:
+        int y
+    with nogil:
+        for y in prange(Y.shape[0], schedule='static'):
+            v210_line(raw[y], Y[y], UV[y])
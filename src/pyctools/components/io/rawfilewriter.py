@@ -0,0 +1,306 @@
+#!/usr/bin/env python
+#  Pyctools - a picture processing algorithm development kit.
+#  http://github.com/jim-easterbrook/pyctools
+#  Copyright (C) 2014  Jim Easterbrook  jim@jim-easterbrook.me.uk
+#
+#  This program is free software: you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation, either version 3 of the
+#  License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#  General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see
+#  <http://www.gnu.org/licenses/>.
+
+"""Write "raw" YUV or RGB files.
+
+This component is the opposite of :py:mod:`RawFileReader
+<pyctools.components.io.rawfilereader>`. It writes uncompressed
+picture data, with no file header, in any of the formats the reader
+can read. The image dimensions and ``fourcc`` code are saved in a
+metadata sidecar file, so the file can be read back without any
+further configuration.
+
+The ``input_Y_RGB`` and ``input_UV`` inputs match the reader's
+outputs. When writing a ``RGB[24]`` or ``BGR[24]`` file ``input_Y_RGB``
+should be an RGB image and ``input_UV`` is not used. Otherwise
+``input_Y_RGB`` is the Y component and ``input_UV`` is the U & V
+components, with the same subsampling as the ``fourcc`` format. The
+U & V inputs should be in the range -128..127, as produced by the
+:py:mod:`RGBtoYUV <pyctools.components.colourspace.rgbtoyuv>`
+component. 10 and 16-bit formats are written from data in the usual
+8-bit range, so floating point inputs keep their extra precision.
+
+Each frame is converted in a single pass by multi-threaded Cython code
+into an array from the component's
+:py:class:`~pyctools.core.base.ArrayPool`. 8-bit planar Y inputs (and
+8-bit RGB inputs) are written without copying. Several frames are
+collected and then written with one (vectored) system call, which
+reduces the overhead of writing large files. ``frames`` sets the
+number of frames written at once.
+
+===========  ===  ====
+Config
+===========  ===  ====
+``path``     str  Path name of file to be created.
+``fourcc``   str  The file format. Any format that can be read by :py:class:`~.rawfilereader.RawFileReader`.
+``frames``   int  Number of frames to write at once.
+===========  ===  ====
+
+"""
+
+__all__ = ['RawFileWriter']
+__docformat__ = 'restructuredtext en'
+
+import io
+import os
+import sys
+
+import numpy
+
+from pyctools.core.config import ConfigPath, ConfigEnum, ConfigInt
+from pyctools.core.base import Component
+from pyctools.core.frame import Metadata, Audit
+from pyctools.core.types import pt_float
+from .rawfilereader import RawFileReader
+from .rawfilewritercore import (
+    pack_packed, pack_planar_uv, pack_planar_y, pack_v210)
+
+# largest number of buffers in one writev call
+_IOV_MAX = 1024
+
+class RawFileWriter(Component):
+    packed_formats = RawFileReader.packed_formats
+    # planar formats: v_ss, h_ss, UV order, bits per sample, left
+    # shift, UV interleaved (semi-planar)
+    planar_formats = {
+        'IYUV'        : (2, 2, 'UV', 8,  0, False),
+        'I420'        : (2, 2, 'UV', 8,  0, False),
+        'YV12'        : (2, 2, 'VU', 8,  0, False),
+        'YV16'        : (1, 2, 'VU', 8,  0, False),
+        'YVU9'        : (4, 4, 'VU', 8,  0, False),
+        'P010'        : (2, 2, 'UV', 10, 6, True),
+        'P016'        : (2, 2, 'UV', 16, 0, True),
+        'P210'        : (1, 2, 'UV', 10, 6, True),
+        'P216'        : (1, 2, 'UV', 16, 0, True),
+        'yuv420p10le' : (2, 2, 'UV', 10, 0, False),
+        'yuv422p10le' : (1, 2, 'UV', 10, 0, False),
+        'yuv444p10le' : (1, 1, 'UV', 10, 0, False),
+        'yuv420p16le' : (2, 2, 'UV', 16, 0, False),
+        'yuv422p16le' : (1, 2, 'UV', 16, 0, False),
+        'yuv444p16le' : (1, 1, 'UV', 16, 0, False),
+        }
+    inputs = ['input_Y_RGB', 'input_UV']
+    outputs = []
+
+    def initialise(self):
+        self.raw_file = None
+        self.config['path'] = ConfigPath()
+        self.config['fourcc'] = ConfigEnum(
+            ['RGB[24]', 'BGR[24]', 'v210'] + sorted(self.packed_formats) +
+            sorted(self.planar_formats))
+        self.config['frames'] = ConfigInt(min_value=1, value=4)
+
+    def process_start(self):
+        super(RawFileWriter, self).process_start()
+        self.update_config()
+        if self.config['fourcc'] in ('RGB[24]', 'BGR[24]'):
+            # don't wait for UV input frames that will never arrive,
+            # and don't store any that do
+            self.input_buffer.pop('input_UV').set_limit(1, 'drop_newest')
+        # allow for the frames waiting to be written
+        self.array_pool.size = self.config['frames'] + 1
+        self.pending = []
+        self.pending_frames = 0
+
+    def process_frame(self):
+        Y_frame = self.input_buffer['input_Y_RGB'].get()
+        if 'input_UV' in self.input_buffer:
+            UV_frame = self.input_buffer['input_UV'].get()
+        else:
+            UV_frame = None
+        if not self.raw_file and not self.open_file(Y_frame, UV_frame):
+            self.stop()
+            return
+        Y_data = Y_frame.as_numpy()
+        if Y_data.shape != self.Y_shape:
+            self.logger.critical('Y/RGB frame %d has shape %s, expected %s',
+                                 Y_frame.frame_no, Y_data.shape, self.Y_shape)
+            self.stop()
+            return
+        if UV_frame:
+            UV_data = UV_frame.as_numpy(dtype=pt_float)
+            if UV_data.shape != self.UV_shape:
+                self.logger.critical(
+                    'UV frame %d has shape %s, expected %s',
+                    UV_frame.frame_no, UV_data.shape, self.UV_shape)
+                self.stop()
+                return
+        else:
+            UV_data = None
+        self.pending += self.pack(Y_data, UV_data)
+        self.pending_frames += 1
+        if self.pending_frames >= self.config['frames']:
+            self.write_pending()
+
+    def open_file(self, Y_frame, UV_frame):
+        """Create the file and its metadata sidecar.
+
+        :return: Was the file created successfully.
+
+        """
+        path = self.config['path']
+        fourcc = self.config['fourcc']
+        ylen, xlen = Y_frame.size()
+        packer = self.make_packer(fourcc, xlen, ylen)
+        if not packer:
+            self.logger.critical("Can't write %s files", fourcc)
+            return False
+        bytes_per_frame, self.Y_shape, self.UV_shape, self.pack = packer
+        md = Metadata().copy(Y_frame.metadata)
+        if UV_frame:
+            md.set_audit(Audit.join(
+                'Y = {\n', Y_frame.metadata.get_audit(), '}\n',
+                'UV = {\n', UV_frame.metadata.get_audit(), '}\n'))
+            audit = '%s = Y, UV\n' % path
+        else:
+            audit = '%s = data\n' % path
+        audit += '    fourcc: %s\n' % fourcc
+        md.extend_audit(audit)
+        md.set('xlen', str(xlen))
+        md.set('ylen', str(ylen))
+        md.set('fourcc', fourcc)
+        md.to_file(path)
+        # unbuffered, as frames are collected before being written
+        self.raw_file = io.open(path, 'wb', buffering=0)
+        return True
+
+    def make_packer(self, fourcc, xlen, ylen):
+        """Get the size of a frame, the expected input shapes and a
+        function to convert one frame of Y (or RGB) and UV arrays to a
+        list of buffers to write.
+
+        This is the opposite of
+        :py:meth:`~.rawfilereader.RawFileReader.make_unpacker`.
+
+        :return: ``(bytes_per_frame, Y_shape, UV_shape, pack)``, or
+            ``None`` if the format is not recognised. ``UV_shape`` is
+            ``None`` for RGB formats.
+
+        """
+        array_pool = self.array_pool
+        if fourcc in ('BGR[24]', 'RGB[24]'):
+            if fourcc == 'BGR[24]':
+                order = slice(None, None, -1)
+            else:
+                order = slice(None)
+            def pack(Y_data, UV_data):
+                if (Y_data.dtype == numpy.uint8 and fourcc == 'RGB[24]' and
+                        Y_data.flags.c_contiguous):
+                    return [Y_data]
+                raw = array_pool.get((ylen, xlen, 3), numpy.uint8)
+                if Y_data.dtype == numpy.uint8:
+                    raw[...] = Y_data[:, :, order]
+                else:
+                    rounded = array_pool.get((ylen, xlen, 3), pt_float)
+                    numpy.add(Y_data[:, :, order], pt_float(0.5), out=rounded)
+                    numpy.clip(rounded, 0, 255, out=rounded)
+                    numpy.copyto(raw, rounded, casting='unsafe')
+                return [raw]
+            return xlen * ylen * 3, (ylen, xlen, 3), None, pack
+        if fourcc in self.packed_formats:
+            pitch, y_0, y_1, u, v, h_ss = self.packed_formats[fourcc]
+            bytes_per_line = (xlen // h_ss) * pitch
+            def pack(Y_data, UV_data):
+                raw = array_pool.get((ylen, bytes_per_line), numpy.uint8)
+                pack_packed(Y_data.astype(pt_float, copy=False), UV_data,
+                            raw, pitch, y_0, y_1, u, v)
+                return [raw]
+            return (bytes_per_line * ylen, (ylen, xlen, 1),
+                    (ylen, xlen // h_ss, 2), pack)
+        if fourcc == 'v210':
+            # lines are padded to a multiple of 48 pixels
+            words_per_line = ((xlen + 47) // 48) * 32
+            def pack(Y_data, UV_data):
+                raw = array_pool.get((ylen, words_per_line), numpy.uint32)
+                pack_v210(Y_data.astype(pt_float, copy=False), UV_data, raw)
+                if sys.byteorder != 'little':
+                    raw = raw.byteswap()
+                return [raw]
+            return (words_per_line * 4 * ylen, (ylen, xlen, 1),
+                    (ylen, xlen // 2, 2), pack)
+        if fourcc not in self.planar_formats:
+            return None
+        v_ss, h_ss, order, bits, shift, interleaved = (
+            self.planar_formats[fourcc])
+        UV_shape = (ylen // v_ss, xlen // h_ss)
+        Y_size = xlen * ylen
+        UV_size = UV_shape[0] * UV_shape[1]
+        scale = pt_float(2 ** (bits - 8))
+        max_value = (2 ** bits) - 1
+        sample_bytes = (bits + 7) // 8
+        if sample_bytes == 1:
+            dtype = numpy.uint8
+        else:
+            dtype = numpy.uint16
+        def pack(Y_data, UV_data):
+            if (Y_data.dtype == numpy.uint8 and bits == 8 and
+                    Y_data.flags.c_contiguous):
+                # write Y data as it is
+                data = array_pool.get((UV_size * 2,), dtype)
+                buffers = [Y_data, data]
+                UV_plane = data
+            else:
+                data = array_pool.get((Y_size + (UV_size * 2),), dtype)
+                pack_planar_y(Y_data.astype(pt_float, copy=False),
+                              data[:Y_size].reshape(ylen, xlen),
+                              scale, max_value, shift)
+                buffers = [data]
+                UV_plane = data[Y_size:]
+            if interleaved:
+                UV_plane = UV_plane.reshape(UV_shape[0], UV_shape[1] * 2)
+                U_plane, V_plane = UV_plane[:, 0::2], UV_plane[:, 1::2]
+            else:
+                U_plane = UV_plane[:UV_size].reshape(UV_shape)
+                V_plane = UV_plane[UV_size:].reshape(UV_shape)
+            if order == 'VU':
+                U_plane, V_plane = V_plane, U_plane
+            pack_planar_uv(UV_data, U_plane, V_plane, scale, max_value, shift)
+            if sample_bytes > 1 and sys.byteorder != 'little':
+                buffers = [x.byteswap() for x in buffers]
+            return buffers
+        return ((Y_size + (UV_size * 2)) * sample_bytes, (ylen, xlen, 1),
+                UV_shape + (2,), pack)
+
+    def write_pending(self):
+        """Write all the collected frames to the file."""
+        buffers = self.pending
+        self.pending = []
+        self.pending_frames = 0
+        if not hasattr(os, 'writev'):
+            for buf in buffers:
+                view = memoryview(buf.reshape(-1).view(numpy.uint8))
+                while len(view):
+                    view = view[self.raw_file.write(view):]
+            return
+        fd = self.raw_file.fileno()
+        while buffers:
+            n = os.writev(fd, buffers[:_IOV_MAX])
+            # remove the buffers (or parts) that were written
+            while buffers and n >= buffers[0].nbytes:
+                n -= buffers.pop(0).nbytes
+            if n:
+                buffers[0] = buffers[0].reshape(-1).view(numpy.uint8)[n:]
+
+    def onStop(self):
+        super(RawFileWriter, self).onStop()
+        if self.raw_file:
+            if self.pending:
+                self.write_pending()
+            self.raw_file.close()
+            self.raw_file = None
@@ -0,0 +1,164 @@
+#  Pyctools - a picture processing algorithm development kit.
+#  http://github.com/jim-easterbrook/pyctools
+#  Copyright (C) 2014  Jim Easterbrook  jim@jim-easterbrook.me.uk
+#
+#  This program is free software: you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation, either version 3 of the
+#  License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#  General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see
+#  <http://www.gnu.org/licenses/>.
+
+"""Cython extension to pack raw file data.
+
+These are the inverse of the functions in
+:py:mod:`.rawfilereadercore`. Each function converts one frame of Y
+and UV data in a single pass, writing to output arrays supplied by the
+caller. 128 (in 8-bit units) is added to UV inputs. Samples are
+rounded and clipped to the range of the output format.
+
+"""
+
+from cython.parallel import prange
+import numpy as np
+
+cimport cython
+cimport numpy
+
+DTYPE = np.float32
+ctypedef numpy.float32_t DTYPE_t
+
+ctypedef fused word_t:
+    numpy.uint8_t
+    numpy.uint16_t
+
+cdef inline int quantise(DTYPE_t x, int max_value) nogil:
+    x = x + 0.5
+    if x < 0.0:
+        return 0
+    if x >= max_value:
+        return max_value
+    return <int>x
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def pack_packed(const DTYPE_t[:, :, :] Y, const DTYPE_t[:, :, :] UV,
+                numpy.uint8_t[:, ::1] raw,
+                int pitch, int y_0, int y_1, int u, int v):
+    """Pack 8-bit YUV, such as UYVY or IYU2.
+
+    The byte offsets have the same meaning as in
+    :py:func:`~.rawfilereadercore.unpack_packed`.
+
+    """
+    cdef:
+        int ylen, uv_xlen, x, y
+        numpy.uint8_t* dst
+    ylen = Y.shape[0]
+    uv_xlen = UV.shape[1]
+    if ylen == 0 or uv_xlen == 0:
+        return
+    with nogil:
+        for y in prange(ylen, schedule='static'):
+            dst = &raw[y, 0]
+            if y_1 < 0:
+                for x in range(uv_xlen):
+                    dst[(x * pitch) + y_0] = quantise(Y[y, x, 0], 255)
+                    dst[(x * pitch) + u] = quantise(UV[y, x, 0] + 128.0, 255)
+                    dst[(x * pitch) + v] = quantise(UV[y, x, 1] + 128.0, 255)
+            else:
+                for x in range(uv_xlen):
+                    dst[(x * pitch) + y_0] = quantise(Y[y, x * 2, 0], 255)
+                    dst[(x * pitch) + y_1] = quantise(
+                        Y[y, (x * 2) + 1, 0], 255)
+                    dst[(x * pitch) + u] = quantise(UV[y, x, 0] + 128.0, 255)
+                    dst[(x * pitch) + v] = quantise(UV[y, x, 1] + 128.0, 255)
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def pack_planar_y(const DTYPE_t[:, :, :] Y, word_t[:, :] plane,
+                  DTYPE_t scale, int max_value, int shift):
+    """Convert Y samples to integers, multiplying by ``scale``,
+    clipping to ``max_value`` and then shifting left by ``shift``
+    bits.
+
+    """
+    cdef:
+        int x, y
+    with nogil:
+        for y in prange(Y.shape[0], schedule='static'):
+            for x in range(Y.shape[1]):
+                plane[y, x] = <word_t>(
+                    quantise(Y[y, x, 0] * scale, max_value) << shift)
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def pack_planar_uv(const DTYPE_t[:, :, :] UV, word_t[:, :] U,
+                   word_t[:, :] V, DTYPE_t scale, int max_value, int shift):
+    """Split UV samples into planes (or strided views) of U and V,
+    adding 128 and then converting as in :py:func:`pack_planar_y`.
+
+    """
+    cdef:
+        int x, y
+    with nogil:
+        for y in prange(UV.shape[0], schedule='static'):
+            for x in range(UV.shape[1]):
+                U[y, x] = <word_t>(quantise(
+                    (UV[y, x, 0] + 128.0) * scale, max_value) << shift)
+                V[y, x] = <word_t>(quantise(
+                    (UV[y, x, 1] + 128.0) * scale, max_value) << shift)
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef void v210_line(const DTYPE_t[:, :] Y, const DTYPE_t[:, :] UV,
+                    numpy.uint32_t[:] raw) nogil:
+    cdef:
+        int xlen, uv_xlen, blocks, b, x, i
+        numpy.uint32_t s[12]
+    xlen = Y.shape[0]
+    uv_xlen = UV.shape[0]
+    blocks = (xlen + 5) // 6
+    for b in range(blocks):
+        # collect 12 samples: Cb Y Cr Y Cb Y Cr Y Cb Y Cr Y
+        for i in range(6):
+            x = (b * 6) + i
+            if x < xlen:
+                s[(i * 2) + 1] = quantise(Y[x, 0] * 4.0, 1023)
+            else:
+                s[(i * 2) + 1] = 0
+        for i in range(3):
+            x = (b * 3) + i
+            if x < uv_xlen:
+                s[i * 4] = quantise((UV[x, 0] + 128.0) * 4.0, 1023)
+                s[(i * 4) + 2] = quantise((UV[x, 1] + 128.0) * 4.0, 1023)
+            else:
+                s[i * 4] = 0
+                s[(i * 4) + 2] = 0
+        for i in range(4):
+            raw[(b * 4) + i] = (s[i * 3] | (s[(i * 3) + 1] << 10) |
+                                (s[(i * 3) + 2] << 20))
+    # clear line padding
+    for i in range(blocks * 4, raw.shape[0]):
+        raw[i] = 0
+
+def pack_v210(const DTYPE_t[:, :, :] Y, const DTYPE_t[:, :, :] UV,
+              numpy.uint32_t[:, :] raw):
+    """Pack 10-bit 4:2:2 "v210" data.
+
+    ``raw`` is indexed by line and 32-bit word, as in
+    :py:func:`~.rawfilereadercore.unpack_v210`.
+
+    """
+    cdef:
+        int y
+    with nogil:
+        for y in prange(Y.shape[0], schedule='static'):
+            v210_line(Y[y], UV[y], raw[y])
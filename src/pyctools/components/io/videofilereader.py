@@ -23,14 +23,59 @@ This component uses `FFmpeg <https://www.ffmpeg.org/>`_ to read video
 from a wide variety of formats. Make sure you have installed FFmpeg
 before attempting to use :py:class:`VideoFileReader`.
 
-===========  ===  ====
+FFmpeg is run by a separate thread, which reads each frame directly
+into an array from the component's
+:py:class:`~pyctools.core.base.ArrayPool`. Up to ``readahead`` frames
+are decoded before they are needed, so decoding can overlap the
+processing done by the following components.
+
+Setting ``type`` to ``'YUV'`` gets the file's picture data in its
+native YCbCr form, without any conversion to RGB. The Y and UV
+components are sent to separate outputs, in the same form as
+:py:class:`~.rawfilereader.RawFileReader` outputs them, so they can be
+connected directly to a :py:mod:`YUVtoRGB
+<pyctools.components.colourspace.yuvtorgb>` component or other YUV
+processing. The UV output keeps the file's 4:2:0, 4:2:2 or 4:4:4
+subsampling (other formats are converted to the nearest of these) and
+is offset to the range -128..127. If ``16bit`` is ``'on'`` 10 and
+16-bit files are read at their full precision, giving floating point
+outputs scaled to the usual 8-bit range.
+
+The first time a file is read it is probed with ``ffprobe`` to find
+its dimensions, pixel format and the timestamp of every frame. This
+index is saved in a ``.index.json`` file next to the video file and
+reused until the video file is modified. ``start_frame`` and
+``end_frame`` select a range of frames. (An ``end_frame`` value of zero
+means the end of the file.) Reading starts from the last key frame
+before ``start_frame`` rather than from the beginning of the file, and
+looping also returns directly to ``start_frame``.
+
+Setting ``segments`` to more than one runs several FFmpeg processes at
+once, to make use of several processor cores in offline processing.
+The frames are split into segments of about ``segment_length`` frames
+(starting at key frames where possible), which are shared out between
+the processes in turn. The frames are then put back in order. This
+works best with "intra only" formats such as ProRes, FFV1 or DNxHD,
+where every frame is a key frame.
+
+Setting ``cache`` to a non-zero size (in MiB) keeps decoded frames in
+a shared :py:class:`~pyctools.core.framecache.FrameCache`. When
+looping through a short clip only the first pass needs to be decoded.
+
+==================  ===  ====
 Config
-===========  ===  ====
-``path``     str  Path name of file to be read.
-``looping``  str  Whether to play continuously. Can be ``'off'`` or ``'repeat'``.
-``type``     str  Output data type. Can be ``'RGB'`` or ``'Y'``.
-``16bit``    str  Attempt to get greater precision than normal 8-bit range. Can be ``'off'`` or ``'on'``.
-===========  ===  ====
+==================  ===  ====
+``path``            str  Path name of file to be read.
+``looping``         str  Whether to play continuously. Can be ``'off'`` or ``'repeat'``.
+``type``            str  Output data type. Can be ``'RGB'``, ``'Y'`` or ``'YUV'``.
+``16bit``           str  Attempt to get greater precision than normal 8-bit range. Can be ``'off'`` or ``'on'``.
+``readahead``       int  Number of decoded frames to buffer.
+``start_frame``     int  First frame to read.
+``end_frame``       int  Stop before this frame. Zero means the end of the file.
+``segments``        int  Number of FFmpeg processes to run at once.
+``segment_length``  int  Number of frames in each segment.
+``cache``           int  Size (MiB) of shared decoded frame cache to use. Zero disables caching.
+==================  ===  ====
 
 """
 
@@ -39,119 +84,460 @@ from __future__ import print_function
 __all__ = ['VideoFileReader']
 __docformat__ = 'restructuredtext en'
 
+import bisect
 from contextlib import contextmanager
+import json
 import logging
 import os
 import re
 import subprocess
 import sys
+import threading
+try:
+    import queue
+except ImportError:
+    import Queue as queue
 
 from guild.actor import *
 import numpy
 
-from pyctools.core.config import ConfigPath, ConfigEnum
-from pyctools.core.base import Component
-from pyctools.core.frame import Metadata
+from pyctools.core.config import ConfigPath, ConfigEnum, ConfigInt
+from pyctools.core.base import Component, InputBuffer, ArrayPool
+from pyctools.core.frame import Frame, Metadata
+from pyctools.core.framecache import FrameCache
 from pyctools.core.types import pt_float
+from .rawfilereadercore import unpack_planar_uv, unpack_planar_y
 
 class VideoFileReader(Component):
     inputs = []
+    outputs = ['output', 'output_UV']
     with_outframe_pool = True
 
     def initialise(self):
-        self.frame_no = 0
-        self.generator = None
+        self.processes = set()
+        self.reader = None
+        self.stopping = False
+        self.stopping_segments = False
         self.config['path'] = ConfigPath()
         self.config['looping'] = ConfigEnum(('off', 'repeat'), dynamic=True)
-        self.config['type'] = ConfigEnum(('RGB', 'Y'))
+        self.config['type'] = ConfigEnum(('RGB', 'Y', 'YUV'))
         self.config['16bit'] = ConfigEnum(('off', 'on'))
+        self.config['readahead'] = ConfigInt(min_value=1, value=4)
+        self.config['start_frame'] = ConfigInt(min_value=0)
+        self.config['end_frame'] = ConfigInt(min_value=0)
+        self.config['segments'] = ConfigInt(min_value=1, value=1)
+        self.config['segment_length'] = ConfigInt(min_value=1, value=25)
+        self.config['cache'] = ConfigInt(min_value=0)
 
     @contextmanager
     def subprocess(self, *arg, **kw):
         try:
             sp = subprocess.Popen(*arg, **kw)
+            self.processes.add(sp)
             yield sp
         finally:
+            self.processes.discard(sp)
             sp.terminate()
             sp.stdout.close()
             sp.stderr.close()
             sp.wait()
 
-    def file_reader(self):
-        """Generator process to read file"""
+    def process_start(self):
+        super(VideoFileReader, self).process_start()
         self.update_config()
         path = self.config['path']
         self.metadata = Metadata().from_file(path)
-        audit = self.metadata.get('audit')
-        audit += 'data = %s\n' % path
+        audit = 'data = %s\n' % path
         audit += '    type: %s, 16bit: %s\n' % (
             self.config['type'], self.config['16bit'])
-        self.metadata.set('audit', audit)
-        # open file to get dimensions
-        with self.subprocess(
-                ['ffmpeg', '-v', 'info', '-y', '-an', '-vn', '-i', path, '-'],
-                stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                universal_newlines=True) as sp:
-            for line in sp.stderr.read().splitlines():
-                match = re.search('(\d{2,})x(\d{2,})', line)
-                if match:
-                    xlen, ylen = map(int, match.groups())
+        audit += '    start_frame: %d, end_frame: %d\n' % (
+            self.config['start_frame'], self.config['end_frame'])
+        self.metadata.extend_audit(audit)
+        # decoded frames are queued in an input buffer, so the base
+        # class only calls process_frame when one is ready
+        readahead = self.config['readahead']
+        self.decoded = InputBuffer(self.notify)
+        self.decoded.set_limit(readahead)
+        self.input_buffer['decoded'] = self.decoded
+        self.array_pool.size += readahead
+        self.reader = threading.Thread(target=self.read_frames)
+        self.reader.daemon = True
+        self.reader.start()
+
+    def read_frames(self):
+        """Thread to decode frames and put them in the buffer."""
+        frame_no = 0
+        try:
+            for frame_type, Y_data, UV_data in self.file_reader():
+                if self.stopping:
                     break
+                frame = Frame()
+                frame.frame_no = frame_no
+                frame.type = frame_type
+                frame.data = Y_data
+                frame.UV_data = UV_data
+                frame_no += 1
+                # blocks when readahead limit is reached
+                self.decoded.input(frame)
+        except Exception as ex:
+            self.logger.exception(ex)
+        self.decoded.input(None)
+
+    def read_into(self, pipe, array):
+        """Fill a numpy array with data from a pipe, without copying.
+
+        :return: Was the array filled.
+
+        """
+        view = memoryview(array.reshape(-1).view(numpy.uint8))
+        pos = 0
+        while pos < len(view):
+            n = pipe.readinto(view[pos:])
+            if not n:
+                return False
+            pos += n
+        return True
+
+    def file_reader(self):
+        """Generator process to read file"""
+        path = self.config['path']
+        index = self.get_index(path)
+        if not index:
+            return
+        frames = 0
+        while not self.stopping:
+            start = self.config['start_frame']
+            end = min(self.config['end_frame'] or len(index['timestamps']),
+                      len(index['timestamps']))
+            if start >= end:
+                self.logger.critical('No frames in range %d:%d of %s',
+                                     start, self.config['end_frame'], path)
+                return
+            out_format = self.output_format(index)
+            if self.config['cache']:
+                cache = FrameCache.shared()
+                cache.reserve(self.config['cache'] * 2**20)
+                cache_key = (path, tuple(index['file']), out_format[:3])
+                # use cached frames until one is missing
+                while start < end and not self.stopping:
+                    frame = cache.get(cache_key + (start,))
+                    if not frame:
+                        break
+                    frames += 1
+                    start += 1
+                    yield frame
+            else:
+                cache = None
+            if start >= end:
+                source = []
+            elif self.config['segments'] > 1:
+                source = self.decode_segments(
+                    path, index, out_format, start, end)
             else:
-                self.logger.critical('Failed to open %s', path)
+                source = self.decode(
+                    self.array_pool, path, index, out_format, start, end)
+            for n, frame in enumerate(source, start):
+                if cache:
+                    cache.put(cache_key + (n,), frame)
+                frames += 1
+                yield frame
+            if frames == 0 or self.config['looping'] == 'off':
                 return
-        while True:
-            bit16 = self.config['16bit'] != 'off'
-            self.frame_type = self.config['type']
-            if self.frame_type == 'RGB':
-                bps = 3
-                pix_fmt = ('rgb24', 'rgb48le')[bit16]
+
+    def output_format(self, index):
+        """Get the ffmpeg pixel format and frame layout to use.
+
+        :return: ``(frame_type, pix_fmt, bit16, shape, UV_shape,
+            scale)``. ``UV_shape`` is ``None`` unless ``frame_type``
+            is ``'YUV'``.
+
+        """
+        xlen, ylen = index['width'], index['height']
+        bit16 = self.config['16bit'] != 'off'
+        frame_type = self.config['type']
+        UV_shape = None
+        scale = None
+        if frame_type == 'YUV':
+            pix_fmt, v_ss, h_ss, scale = self.yuv_format(
+                index['pix_fmt'], bit16)
+            bps = 1
+            UV_shape = (-(-ylen // v_ss), -(-xlen // h_ss))
+        elif frame_type == 'RGB':
+            bps = 3
+            pix_fmt = ('rgb24', 'rgb48le')[bit16]
+        else:
+            bps = 1
+            pix_fmt = ('gray', 'gray16le')[bit16]
+        return frame_type, pix_fmt, bit16, (ylen, xlen, bps), UV_shape, scale
+
+    def decode(self, array_pool, path, index, out_format, start, end):
+        """Generator to decode a range of frames with one ffmpeg
+        process.
+
+        """
+        frame_type, pix_fmt, bit16, shape, UV_shape, scale = out_format
+        timestamps = index['timestamps']
+        Y_size = shape[0] * shape[1] * shape[2]
+        if UV_shape:
+            UV_size = UV_shape[0] * UV_shape[1]
+        else:
+            UV_size = 0
+        # seek to last key frame before start, then skip frames
+        seek = []
+        key = index['keyframes'][
+            bisect.bisect_right(index['keyframes'], start) - 1]
+        if key > 0:
+            # aim between key frame and next frame to avoid rounding
+            # errors
+            ts = timestamps[key] - index['start_time']
+            if key + 1 < len(timestamps):
+                ts = (ts + timestamps[key + 1] - index['start_time']) / 2.0
+            seek = ['-noaccurate_seek', '-ss', '%.6f' % ts]
+        skip = []
+        if start > key:
+            skip = ['-vf', 'trim=start_frame=%d,setpts=PTS-STARTPTS' % (
+                start - key)]
+        # open file to read data
+        with self.subprocess(
+                ['ffmpeg', '-v', 'warning', '-an'] + seek + ['-i', path] +
+                skip + ['-frames:v', str(end - start),
+                        '-f', 'image2pipe', '-pix_fmt', pix_fmt,
+                        '-c:v', 'rawvideo', '-'],
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                bufsize=0) as sp:
+            while not self.stopping:
+                if bit16:
+                    raw = array_pool.get((Y_size + (UV_size * 2),), '<u2')
+                else:
+                    raw = array_pool.get(
+                        (Y_size + (UV_size * 2),), numpy.uint8)
+                if not self.read_into(sp.stdout, raw):
+                    break
+                if not raw.dtype.isnative:
+                    raw = raw.astype(numpy.uint16)
+                Y_data = raw[:Y_size].reshape(shape)
+                UV_data = None
+                if frame_type == 'YUV':
+                    if bit16:
+                        Y_plane = Y_data
+                        Y_data = array_pool.get(shape, pt_float)
+                        unpack_planar_y(Y_plane[:, :, 0], Y_data, scale)
+                    U_plane = raw[Y_size:Y_size + UV_size].reshape(UV_shape)
+                    V_plane = raw[Y_size + UV_size:].reshape(UV_shape)
+                    UV_data = array_pool.get(UV_shape + (2,), pt_float)
+                    unpack_planar_uv(U_plane, V_plane, UV_data, scale)
+                elif bit16:
+                    image = array_pool.get(shape, pt_float)
+                    numpy.multiply(Y_data, pt_float(1.0 / 256.0), out=image)
+                    Y_data = image
+                yield frame_type, Y_data, UV_data
+
+    def decode_segments(self, path, index, out_format, start, end):
+        """Generator to decode a range of frames with several ffmpeg
+        processes running at once.
+
+        The range is split into segments of ``segment_length`` frames.
+        The segments are shared out between ``segments`` threads in
+        turn, and the frames are put back in order.
+
+        """
+        segments = self.config['segments']
+        length = self.config['segment_length']
+        # use key frames as segment boundaries if possible
+        bounds = [start]
+        keyframes = index['keyframes']
+        while bounds[-1] + length < end:
+            i = bisect.bisect_right(keyframes, bounds[-1] + length) - 1
+            if keyframes[i] > bounds[-1]:
+                bounds.append(keyframes[i])
             else:
-                bps = 1
-                pix_fmt = ('gray', 'gray16le')[bit16]
-            bytes_per_line = xlen * ylen * bps
-            if bit16:
-                bytes_per_line *= 2
-            # open file to read data
-            with self.subprocess(
-                    ['ffmpeg', '-v', 'warning', '-an', '-i', path,
-                     '-f', 'image2pipe', '-pix_fmt', pix_fmt,
-                     '-c:v', 'rawvideo', '-'],
-                    stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                    bufsize=bytes_per_line) as sp:
+                bounds.append(bounds[-1] + length)
+        bounds.append(end)
+        ranges = list(zip(bounds[:-1], bounds[1:]))
+        queues = [queue.Queue(maxsize=length) for i in range(segments)]
+        threads = []
+        for i in range(segments):
+            thread = threading.Thread(
+                target=self._segment_decoder,
+                args=(queues[i], path, index, out_format, ranges[i::segments]))
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+        try:
+            for n in range(len(ranges)):
+                q = queues[n % segments]
                 while True:
-                    try:
-                        raw_data = sp.stdout.read(bytes_per_line)
-                    except Exception as ex:
-                        self.logger.exception(ex)
-                        return
-                    if len(raw_data) < bytes_per_line:
+                    frame = self._get(q)
+                    if frame is None:
+                        # end of segment, or stopping
                         break
-                    if bit16:
-                        image = numpy.fromstring(raw_data, dtype=numpy.uint16)
-                        image = image.astype(pt_float) / pt_float(256.0)
-                    else:
-                        image = numpy.fromstring(raw_data, dtype=numpy.uint8)
-                    yield image.reshape((ylen, xlen, bps))
-            self.update_config()
-            if self.frame_no == 0 or self.config['looping'] == 'off':
-                return
+                    if isinstance(frame, Exception):
+                        # decoder thread failed
+                        raise frame
+                    yield frame
+                if self.stopping:
+                    break
+        finally:
+            self.stopping_segments = True
+            for thread in threads:
+                thread.join()
+            self.stopping_segments = False
+
+    def _segment_decoder(self, q, path, index, out_format, ranges):
+        # each thread needs its own array pool
+        array_pool = ArrayPool(size=self.config['segment_length'] + 2)
+        try:
+            for start, end in ranges:
+                for frame in self.decode(
+                        array_pool, path, index, out_format, start, end):
+                    if not self._put(q, frame):
+                        return
+                # mark end of segment
+                if not self._put(q, None):
+                    return
+        except Exception as ex:
+            # pass exception to consumer, which will stop reading
+            self._put(q, ex)
+
+    def _put(self, q, item):
+        # put item in queue, unless stopping
+        while not (self.stopping or self.stopping_segments):
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _get(self, q):
+        # get item from queue, or None if stopping
+        while not (self.stopping or self.stopping_segments):
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        return None
+
+    def get_index(self, path):
+        """Get a video file's dimensions, pixel format, frame
+        timestamps and key frames.
+
+        The result of probing the file is cached in a ``.index.json``
+        file, which is used if the video file's modification time and
+        size haven't changed.
+
+        :return: Index :py:class:`dict`, or ``None`` if the file
+            can't be probed.
+
+        """
+        index_path = path + '.index.json'
+        stat = os.stat(path)
+        file_id = [stat.st_mtime, stat.st_size]
+        if os.path.exists(index_path):
+            try:
+                with open(index_path) as f:
+                    index = json.load(f)
+                if index['file'] == file_id:
+                    return index
+            except (IOError, ValueError, KeyError):
+                pass
+        try:
+            info = json.loads(subprocess.check_output(
+                ['ffprobe', '-v', 'error', '-select_streams', 'v:0',
+                 '-show_entries', 'stream=width,height,pix_fmt:'
+                 'format=start_time', '-of', 'json', path],
+                universal_newlines=True))
+            packets = subprocess.check_output(
+                ['ffprobe', '-v', 'error', '-select_streams', 'v:0',
+                 '-show_entries', 'packet=pts_time,flags',
+                 '-of', 'csv=print_section=0', path],
+                universal_newlines=True)
+            stream = info['streams'][0]
+        except (OSError, subprocess.CalledProcessError,
+                ValueError, KeyError, IndexError) as ex:
+            self.logger.critical('Failed to open %s: %s', path, str(ex))
+            return None
+        # packets are in decoding order, frames are in timestamp order
+        frames = []
+        for line in packets.splitlines():
+            pts_time, flags = (line.split(',') + [''])[:2]
+            try:
+                frames.append((float(pts_time), 'K' in flags))
+            except ValueError:
+                # no timestamp
+                continue
+        frames.sort()
+        try:
+            start_time = float(info['format']['start_time'])
+        except (KeyError, ValueError):
+            start_time = 0.0
+        index = {
+            'file'       : file_id,
+            'width'      : int(stream['width']),
+            'height'     : int(stream['height']),
+            'pix_fmt'    : stream.get('pix_fmt', ''),
+            'start_time' : start_time,
+            'timestamps' : [x[0] for x in frames],
+            'keyframes'  : [n for n, x in enumerate(frames) if x[1]] or [0],
+            }
+        if index['keyframes'][0] != 0:
+            index['keyframes'].insert(0, 0)
+        try:
+            with open(index_path, 'w') as f:
+                json.dump(index, f)
+        except IOError as ex:
+            self.logger.warning('Cannot save index %s: %s', index_path, str(ex))
+        return index
+
+    def yuv_format(self, native_fmt, bit16):
+        """Choose the planar YUV format nearest to a file's native
+        pixel format.
+
+        :return: ``(pix_fmt, v_ss, h_ss, scale)``
+
+        """
+        if '444' in native_fmt:
+            sampling, v_ss, h_ss = '444', 1, 1
+        elif '422' in native_fmt:
+            sampling, v_ss, h_ss = '422', 1, 2
+        else:
+            sampling, v_ss, h_ss = '420', 2, 2
+        if not bit16:
+            return 'yuv%sp' % sampling, v_ss, h_ss, pt_float(1.0)
+        match = re.search(r'p(\d+)[lb]e$', native_fmt)
+        if match and int(match.group(1)) <= 10:
+            return ('yuv%sp10le' % sampling, v_ss, h_ss,
+                    pt_float(1.0 / 4.0))
+        return 'yuv%sp16le' % sampling, v_ss, h_ss, pt_float(1.0 / 256.0)
 
     def process_frame(self):
+        self.update_config()
+        in_frame = self.decoded.get()
         frame = self.outframe_pool['output'].get()
-        if not self.generator:
-            self.generator = self.file_reader()
-        try:
-            frame.data = next(self.generator)
-        except StopIteration:
-            self.output(None)
-            self.stop()
-            return
-        frame.type = self.frame_type
-        frame.frame_no = self.frame_no
-        self.frame_no += 1
+        frame.data = in_frame.data
+        frame.type = in_frame.type
+        frame.frame_no = in_frame.frame_no
         frame.metadata.copy(self.metadata)
+        if in_frame.UV_data is None:
+            self.output(frame)
+            return
+        frame.type = 'Y'
         self.output(frame)
+        UV_frame = self.outframe_pool['output_UV'].get()
+        UV_frame.initialise(frame)
+        UV_frame.data = in_frame.UV_data
+        UV_frame.type = 'CbCr'
+        self.output_UV(UV_frame)
+
+    def onStop(self):
+        self.stopping = True
+        # base class closes the buffer, releasing a blocked reader
+        super(VideoFileReader, self).onStop()
+        for sp in list(self.processes):
+            sp.terminate()
+        if self.reader:
+            self.reader.join()
+            self.reader = None
 
 def main():
     from PyQt4 import QtGui
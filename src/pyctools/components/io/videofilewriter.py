@@ -36,6 +36,25 @@ include the following:
 I'd be interested to hear of any other good combinations. Email me at
 the address shown below.
 
+Frames are converted to 8 or 16-bit integers in arrays from the
+component's :py:class:`~pyctools.core.base.ArrayPool` (frames that are
+already 8-bit are used as they are) and then passed to a separate
+thread that writes them to FFmpeg. Up to ``queue`` frames can wait to
+be written, so a slow encoder only holds up the rest of the pipeline
+when it falls that far behind. The number of frames waiting is
+included in the component's :py:meth:`get_stats` result.
+
+Setting ``yuv`` to ``'8bit'``, ``'10bit'`` or ``'16bit'`` writes "YUV"
+(YCbCr) video without converting it to RGB first. The Y component
+goes to ``input`` and the U & V components (in the range -128..127) to
+``input_UV``, as output by
+:py:class:`~pyctools.components.io.rawfilereader.RawFileReader` or
+:py:class:`~pyctools.components.io.videofilereader.VideoFileReader`.
+They are sent to FFmpeg as planar YUV with the same subsampling as
+the inputs, e.g. ``yuv420p`` or ``yuv422p10le``, so a matching
+``-pix_fmt`` in ``encoder`` needs no conversion. (``input_UV`` is not
+used when ``yuv`` is ``'off'``.)
+
 ===========  ===  ====
 Config
 ===========  ===  ====
@@ -43,25 +62,54 @@ Config
 ``encoder``  str  A string of ``ffmpeg`` options.
 ``fps``      int  Video frame rate. Only affects how file is replayed.
 ``16bit``    str  Attempt to write precision than normal 8-bit range. Can be ``'off'`` or ``'on'``.
+``queue``    int  Maximum number of frames waiting to be written.
+``yuv``      str  Write planar YUV from Y and UV inputs. Can be ``'off'``, ``'8bit'``, ``'10bit'`` or ``'16bit'``.
 ===========  ===  ====
 
 """
 
 __all__ = ['VideoFileWriter']
 
-from contextlib import contextmanager
 import subprocess
+import sys
+import threading
+import time
+try:
+    import queue
+except ImportError:
+    import Queue as queue
 
 import numpy
 
 from pyctools.core.config import ConfigPath, ConfigInt, ConfigEnum
-from pyctools.core.frame import Metadata
+from pyctools.core.frame import Metadata, Audit
 from pyctools.core.base import Transformer
 from pyctools.core.types import pt_float
+from .rawfilewritercore import pack_planar_uv, pack_planar_y
 
 class VideoFileWriter(Transformer):
+    # subsampling (v_ss, h_ss) to ffmpeg pix_fmt name
+    yuv_formats = {
+        (1, 1) : '444',
+        (2, 1) : '440',
+        (1, 2) : '422',
+        (2, 2) : '420',
+        (1, 4) : '411',
+        (4, 4) : '410',
+        }
+    # formats that FFmpeg also has in 10 and 16 bit versions
+    yuv_formats_10bit = ('444', '440', '422', '420')
+    yuv_formats_16bit = ('444', '422', '420')
+    inputs = ['input', 'input_UV']
+
     def initialise(self):
-        self.generator = None
+        self.sp = None
+        self.writer = None
+        self.encoder_stats = {
+            'queued'     : 0,
+            'high_water' : 0,
+            'write_time' : 0.0,
+            }
         self.config['path'] = ConfigPath()
         self.config['encoder'] = ConfigEnum(
             ('-c:v ffv1 -pix_fmt bgr0',
@@ -72,84 +120,256 @@ class VideoFileWriter(Transformer):
              ), extendable=True)
         self.config['fps'] = ConfigInt(value=25)
         self.config['16bit'] = ConfigEnum(('off', 'on'))
+        self.config['queue'] = ConfigInt(min_value=1, value=4)
+        self.config['yuv'] = ConfigEnum(('off', '8bit', '10bit', '16bit'))
+
+    def get_stats(self):
+        """Get the component's runtime statistics.
+
+        As well as the items described in
+        :py:meth:`Component.get_stats
+        <pyctools.core.base.Component.get_stats>` the result includes
+        an ``encoder`` :py:class:`dict` with the following items:
+
+        ==============  =====  ====
+        ``queued``      int    Number of frames waiting to be written.
+        ``high_water``  int    Largest number of frames that have been waiting.
+        ``write_time``  float  Total time spent writing to FFmpeg.
+        ==============  =====  ====
+
+        :rtype: :py:class:`dict`
+
+        """
+        result = super(VideoFileWriter, self).get_stats()
+        result['encoder'] = dict(self.encoder_stats)
+        if self.writer:
+            result['encoder']['queued'] = self.encoder_queue.qsize()
+        return result
+
+    def process_start(self):
+        super(VideoFileWriter, self).process_start()
+        self.update_config()
+        if self.config['yuv'] == 'off':
+            # don't wait for UV input frames that will never arrive,
+            # and don't store any that do
+            self.input_buffer.pop('input_UV').set_limit(1, 'drop_newest')
+
+    def process_frame(self):
+        if 'input_UV' not in self.input_buffer:
+            return super(VideoFileWriter, self).process_frame()
+        Y_frame = self.input_buffer['input'].get()
+        UV_frame = self.input_buffer['input_UV'].get()
+        out_frame = self.outframe_pool['output'].get()
+        out_frame.initialise(Y_frame)
+        if self.transform(Y_frame, out_frame, UV_frame):
+            self.output(out_frame)
+        else:
+            self.output(None)
+            self.stop()
+
+    def yuv_pix_fmt(self, Y_frame, UV_frame):
+        """Get the ffmpeg pixel format matching a pair of Y and UV
+        frames.
+
+        :return: ``pix_fmt``, or ``None`` if the frames can't be
+            written.
+
+        """
+        ylen, xlen, bpc = Y_frame.as_numpy().shape
+        UV_ylen, UV_xlen, UV_bpc = UV_frame.as_numpy().shape
+        if bpc != 1 or UV_bpc != 2:
+            self.logger.critical('Cannot write Y frame with %d components '
+                                 'and UV frame with %d', bpc, UV_bpc)
+            return None
+        v_ss = int(round(float(ylen) / UV_ylen))
+        h_ss = int(round(float(xlen) / UV_xlen))
+        if ((v_ss, h_ss) not in self.yuv_formats or
+                UV_ylen != -(-ylen // v_ss) or UV_xlen != -(-xlen // h_ss)):
+            self.logger.critical('Cannot write UV frame of size %dx%d with '
+                                 'Y frame of size %dx%d',
+                                 UV_xlen, UV_ylen, xlen, ylen)
+            return None
+        ss = self.yuv_formats[(v_ss, h_ss)]
+        if ((self.yuv_bits == 10 and ss not in self.yuv_formats_10bit) or
+                (self.yuv_bits == 16 and ss not in self.yuv_formats_16bit)):
+            self.logger.critical('Cannot write %d-bit YUV%s',
+                                 self.yuv_bits, ss)
+            return None
+        pix_fmt = 'yuv%sp' % ss
+        if self.yuv_bits == 10:
+            pix_fmt += '10le'
+        elif self.yuv_bits == 16:
+            pix_fmt += '16le'
+        return pix_fmt
+
+    def open_encoder(self, in_frame, UV_frame=None):
+        """Start FFmpeg and the writer thread.
+
+        :return: Was FFmpeg started successfully.
 
-    @contextmanager
-    def subprocess(self, *arg, **kw):
-        try:
-            sp = subprocess.Popen(*arg, **kw)
-            yield sp
-        finally:
-            sp.stdin.flush()
-            sp.stdin.close()
-            sp.wait()
-
-    def file_writer(self, in_frame):
-        """Generator process to write file"""
+        """
         self.update_config()
         path = self.config['path']
         encoder = self.config['encoder']
         fps = self.config['fps']
-        bit16 = self.config['16bit'] != 'off'
+        self.bit16 = self.config['16bit'] != 'off'
+        self.yuv_bits = None
         numpy_image = in_frame.as_numpy()
         ylen, xlen, bpc = numpy_image.shape
-        if bpc == 3:
+        md = Metadata().copy(in_frame.metadata)
+        if UV_frame:
+            self.yuv_bits = int(self.config['yuv'][:-3])
+            pix_fmt = self.yuv_pix_fmt(in_frame, UV_frame)
+            if not pix_fmt:
+                return False
+            self.Y_dims = ylen, xlen
+            self.UV_dims = UV_frame.as_numpy().shape[:2]
+            md.set_audit(Audit.join(
+                'Y = {\n', in_frame.metadata.get_audit(), '}\n',
+                'UV = {\n', UV_frame.metadata.get_audit(), '}\n'))
+            audit = '%s = Y, UV\n' % path
+            audit += '    encoder: "%s"\n' % (encoder)
+            audit += '    yuv: %s\n' % (self.config['yuv'])
+        elif bpc == 3:
             if in_frame.type != 'RGB':
                 self.logger.warning('Expected RGB input, got %s', in_frame.type)
-            pix_fmt = ('rgb24', 'rgb48le')[bit16]
+            pix_fmt = ('rgb24', 'rgb48le')[self.bit16]
         elif bpc == 1:
             if in_frame.type != 'Y':
                 self.logger.warning('Expected Y input, got %s', in_frame.type)
-            pix_fmt = ('gray', 'gray16le')[bit16]
+            pix_fmt = ('gray', 'gray16le')[self.bit16]
         else:
             self.logger.critical(
                 'Cannot write %s frame with %d components', in_frame.type, bpc)
-            return
-        md = Metadata().copy(in_frame.metadata)
-        audit = md.get('audit')
-        audit += '%s = data\n' % path
-        audit += '    encoder: "%s"\n' % (encoder)
-        audit += '    16bit: %s\n' % (self.config['16bit'])
-        md.set('audit', audit)
+            return False
+        if not UV_frame:
+            audit = '%s = data\n' % path
+            audit += '    encoder: "%s"\n' % (encoder)
+            audit += '    16bit: %s\n' % (self.config['16bit'])
+        md.extend_audit(audit)
         md.to_file(path)
-        with self.subprocess(
-                ['ffmpeg', '-v', 'warning', '-y', '-an',
-                 '-s', '%dx%d' % (xlen, ylen),
-                 '-f', 'rawvideo', '-c:v', 'rawvideo',
-                 '-r', '%d' % fps, '-pix_fmt', pix_fmt, '-i', '-',
-                 '-r', '%d' % fps] + encoder.split() + [path],
-                stdin=subprocess.PIPE) as sp:
-            while True:
-                in_frame = yield True
-                if not in_frame:
-                    break
-                if bit16:
-                    numpy_image = in_frame.as_numpy(dtype=pt_float)
-                    numpy_image = numpy_image * pt_float(256.0)
-                    numpy_image = numpy_image.clip(
-                        pt_float(0), pt_float(2**16 - 1)).astype(numpy.uint16)
-                else:
-                    numpy_image = in_frame.as_numpy(dtype=numpy.uint8)
-                sp.stdin.write(numpy_image.tostring())
-                del in_frame
-
-    def transform(self, in_frame, out_frame):
-        if not self.generator:
-            self.generator = self.file_writer(in_frame)
+        self.sp = subprocess.Popen(
+            ['ffmpeg', '-v', 'warning', '-y', '-an',
+             '-s', '%dx%d' % (xlen, ylen),
+             '-f', 'rawvideo', '-c:v', 'rawvideo',
+             '-r', '%d' % fps, '-pix_fmt', pix_fmt, '-i', '-',
+             '-r', '%d' % fps] + encoder.split() + [path],
+            stdin=subprocess.PIPE)
+        # allow for frames waiting to be written
+        self.array_pool.size = self.config['outframe_pool_len'] + (
+            self.config['queue'] + 2)
+        self.encoder_queue = queue.Queue(maxsize=self.config['queue'])
+        self.encoder_error = False
+        self.writer = threading.Thread(target=self.write_frames)
+        self.writer.daemon = True
+        self.writer.start()
+        return True
+
+    def write_frames(self):
+        """Thread to write queued frames to FFmpeg."""
+        while True:
+            data = self.encoder_queue.get()
+            if data is None:
+                break
+            if self.encoder_error:
+                # discard frames, so transform isn't blocked
+                continue
+            start = time.time()
             try:
-                self.generator.send(None)
-            except StopIteration:
-                return False
-        try:
-            self.generator.send(in_frame)
-        except Exception as ex:
-            self.logger.exception(ex)
+                for buf in data:
+                    self.sp.stdin.write(buf)
+            except Exception as ex:
+                self.logger.exception(ex)
+                self.encoder_error = True
+            self.encoder_stats['write_time'] += time.time() - start
+            del data
+
+    def convert_yuv(self, Y_frame, UV_frame):
+        """Pack a pair of Y and UV frames into planar YUV."""
+        Y_data = Y_frame.as_numpy()
+        UV_data = UV_frame.as_numpy(dtype=pt_float)
+        ylen, xlen = Y_data.shape[:2]
+        UV_ylen, UV_xlen = UV_data.shape[:2]
+        Y_size = xlen * ylen
+        UV_size = UV_xlen * UV_ylen
+        bits = self.yuv_bits
+        scale = pt_float(2 ** (bits - 8))
+        max_value = (2 ** bits) - 1
+        if bits == 8:
+            dtype = numpy.uint8
+        else:
+            dtype = numpy.uint16
+        if bits == 8 and Y_data.dtype == numpy.uint8:
+            # use Y data as it is
+            result = [numpy.ascontiguousarray(Y_data)]
+            UV_plane = self.array_pool.get((UV_size * 2,), dtype)
+            result.append(UV_plane)
+        else:
+            data = self.array_pool.get((Y_size + (UV_size * 2),), dtype)
+            pack_planar_y(Y_data.astype(pt_float, copy=False),
+                          data[:Y_size].reshape(ylen, xlen),
+                          scale, max_value, 0)
+            result = [data]
+            UV_plane = data[Y_size:]
+        pack_planar_uv(UV_data,
+                       UV_plane[:UV_size].reshape(UV_ylen, UV_xlen),
+                       UV_plane[UV_size:].reshape(UV_ylen, UV_xlen),
+                       scale, max_value, 0)
+        if bits > 8 and sys.byteorder != 'little':
+            result = [x.byteswap() for x in result]
+        return result
+
+    def convert(self, in_frame):
+        """Get a frame's data as a contiguous array of the type FFmpeg
+        expects.
+
+        """
+        data = in_frame.as_numpy()
+        if self.bit16:
+            scaled = self.array_pool.get(data.shape, pt_float)
+            numpy.multiply(data, pt_float(256.0), out=scaled)
+            numpy.clip(scaled, pt_float(0), pt_float(2**16 - 1), out=scaled)
+            result = self.array_pool.get(data.shape, '<u2')
+        elif data.dtype == numpy.uint8:
+            return [numpy.ascontiguousarray(data)]
+        else:
+            scaled = self.array_pool.get(data.shape, pt_float)
+            numpy.clip(data, pt_float(0), pt_float(255), out=scaled)
+            result = self.array_pool.get(data.shape, numpy.uint8)
+        numpy.copyto(result, scaled, casting='unsafe')
+        return [result]
+
+    def transform(self, in_frame, out_frame, UV_frame=None):
+        if not self.writer and not self.open_encoder(in_frame, UV_frame):
+            return False
+        if self.encoder_error:
             return False
+        if UV_frame:
+            if (in_frame.as_numpy().shape[:2] != self.Y_dims or
+                    UV_frame.as_numpy().shape[:2] != self.UV_dims):
+                self.logger.critical('Frame %d size has changed',
+                                     in_frame.frame_no)
+                return False
+            data = self.convert_yuv(in_frame, UV_frame)
+        else:
+            data = self.convert(in_frame)
+        # blocks if the encoder is too far behind
+        self.encoder_queue.put(data)
+        self.encoder_stats['high_water'] = max(
+            self.encoder_stats['high_water'], self.encoder_queue.qsize())
         return True
 
     def onStop(self):
         super(VideoFileWriter, self).onStop()
-        if self.generator:
+        if self.writer:
+            self.encoder_queue.put(None)
+            self.writer.join()
+            self.writer = None
+        if self.sp:
             try:
-                self.generator.send(None)
-            except StopIteration:
-                pass
+                self.sp.stdin.flush()
+                self.sp.stdin.close()
+            except Exception as ex:
+                self.logger.exception(ex)
+            self.sp.wait()
+            self.sp = None
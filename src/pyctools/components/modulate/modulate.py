@@ -46,9 +46,7 @@ For example, a cell to simulate a `Bayer filter
     cell.data = numpy.array([[[[0, 0, 1], [0, 1, 0]],
                               [[0, 1, 0], [1, 0, 0]]]], dtype=numpy.float32)
     cell.type = 'cell'
-    audit = cell.metadata.get('audit')
-    audit += 'data = Bayer filter modulation cell\\n'
-    cell.metadata.set('audit', audit)
+    cell.metadata.extend_audit('data = Bayer filter modulation cell\\n')
 
 """
 
@@ -89,10 +87,9 @@ class Modulate(Transformer):
                 self.logger.warning('Mismatch between %d cells and %d components',
                                     self.cell_count, in_data.shape[2])
         out_frame.data = modulate_frame(
-            in_data, self.cell_data, in_frame.frame_no)
-        audit = out_frame.metadata.get('audit')
-        audit += 'data = Modulate(data)\n'
-        audit += '    cell: {\n%s}\n' % (
-            self.cell_frame.metadata.get('audit'))
-        out_frame.metadata.set('audit', audit)
+            in_data, self.cell_data, in_frame.frame_no,
+            out=self.array_pool.get(in_data.shape, numpy.float32))
+        out_frame.metadata.extend_audit(
+            'data = Modulate(data)\n    cell: {\n',
+            self.cell_frame.metadata.get_audit(), '}\n')
         return True
@@ -47,12 +47,18 @@ cdef void modulate_frame_c(DTYPE_t[:, :, :] out_frame,
 @cython.boundscheck(False)
 def modulate_frame(numpy.ndarray[DTYPE_t, ndim=3] in_frame,
                    numpy.ndarray[DTYPE_t, ndim=4] cell,
-                   unsigned int frame_no):
+                   unsigned int frame_no,
+                   numpy.ndarray[DTYPE_t, ndim=3] out=None):
     cdef:
         unsigned int zlen, k
     zlen = cell.shape[0]
     k = frame_no % zlen
-    out_frame = np.empty([in_frame.shape[0], in_frame.shape[1],
-                          in_frame.shape[2]], dtype=DTYPE)
-    modulate_frame_c(out_frame, in_frame, cell[k])
-    return out_frame
+    if out is None:
+        out = np.empty([in_frame.shape[0], in_frame.shape[1],
+                        in_frame.shape[2]], dtype=DTYPE)
+    elif (out.shape[0] != in_frame.shape[0] or
+          out.shape[1] != in_frame.shape[1] or
+          out.shape[2] != in_frame.shape[2]):
+        raise ValueError('Output array has wrong shape')
+    modulate_frame_c(out, in_frame, cell[k])
+    return out
@@ -30,6 +30,7 @@ __all__ = ['Collator']
 import numpy
 
 from pyctools.core.base import Component
+from pyctools.core.frame import Audit
 
 class Collator(Component):
     inputs = ['input1', 'input2']
@@ -40,10 +41,10 @@ class Collator(Component):
         in_frame2 = self.input_buffer['input2'].get()
         out_frame = self.outframe_pool['output'].get()
         out_frame.initialise(in_frame1)
-        audit = 'input1 = {\n%s}\n' % in_frame1.metadata.get('audit')
-        audit += 'input2 = {\n%s}\n' % in_frame2.metadata.get('audit')
-        audit += 'data = [input1, input2]\n'
-        out_frame.metadata.set('audit', audit)
+        out_frame.metadata.set_audit(Audit.join(
+            'input1 = {\n', in_frame1.metadata.get_audit(), '}\n',
+            'input2 = {\n', in_frame2.metadata.get_audit(), '}\n',
+            'data = [input1, input2]\n'))
         out_frame.data = numpy.concatenate(
             (in_frame1.as_numpy(), in_frame2.as_numpy()), axis=2)
         self.output(out_frame)
@@ -24,6 +24,7 @@
 __all__ = ['Subtracter']
 
 from pyctools.core.base import Component
+from pyctools.core.frame import Audit
 
 class Subtracter(Component):
     inputs = ['input0', 'input1']
@@ -34,9 +35,9 @@ class Subtracter(Component):
         in_frame2 = self.input_buffer['input1'].get()
         out_frame = self.outframe_pool['output'].get()
         out_frame.initialise(in_frame1)
-        audit = 'input0 = {\n%s}\n' % in_frame1.metadata.get('audit')
-        audit += 'input1 = {\n%s}\n' % in_frame2.metadata.get('audit')
-        audit += 'data = input0 - input1\n'
-        out_frame.metadata.set('audit', audit)
+        out_frame.metadata.set_audit(Audit.join(
+            'input0 = {\n', in_frame1.metadata.get_audit(), '}\n',
+            'input1 = {\n', in_frame2.metadata.get_audit(), '}\n',
+            'data = input0 - input1\n'))
         out_frame.data = in_frame1.as_numpy() - in_frame2.as_numpy()
         self.output(out_frame)
@@ -179,8 +179,7 @@ class ZonePlateGenerator(Component):
         kty = self.config['kty']
         kt2 = self.config['kt2']
         frame = self.outframe_pool['output'].get()
-        audit = frame.metadata.get('audit')
-        audit += 'data = ZonePlateGenerator()\n'
+        audit = 'data = ZonePlateGenerator()\n'
         audit += '    '
         if k0 != 0.0:
             audit += 'k0: %g, ' % k0
@@ -209,7 +208,7 @@ class ZonePlateGenerator(Component):
         if kt2 != 0.0:
             audit += 'kt2: %g, ' % kt2
         audit += 'xlen: %d, ylen: %d, zlen: %d\n' % (xlen, ylen, zlen)
-        frame.metadata.set('audit', audit)
+        frame.metadata.extend_audit(audit)
         k0 =        k0  * self.phases
         kx =        kx  * self.phases
         ky = (1.0 - ky) * self.phases
@@ -224,7 +223,7 @@ class ZonePlateGenerator(Component):
         kty =      -kty * self.phases / float(ylen)
         kt2 =       kt2 * self.phases / float(zlen)
         # generate this frame
-        data = numpy.ndarray([ylen, xlen, 1], dtype=numpy.float32)
+        data = self.array_pool.get((ylen, xlen, 1), numpy.float32)
         zone_frame(data, self.waveform, self.frame_no % zlen,
                    k0, kx, ky, kt, kx2, kxy, kxt, kyx, ky2, kyt, ktx, kty, kt2)
         # set output frame
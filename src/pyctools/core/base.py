@@ -23,29 +23,93 @@
 
    Component
    Transformer
+   InputBuffer
    ObjectPool
+   ArrayPool
 
 """
 
-__all__ = ['Component', 'Transformer', 'ObjectPool']
+__all__ = ['Component', 'Transformer', 'InputBuffer', 'ObjectPool', 'ArrayPool']
 __docformat__ = 'restructuredtext en'
 
-from collections import deque
+from collections import deque, OrderedDict
 import logging
+import sys
+import threading
+import time
 import weakref
 
 from guild.actor import Actor, actor_method
+import numpy
 
 from .config import ConfigMixin, ConfigInt
 from .frame import Frame, Metadata
 
 class InputBuffer(object):
+    """Threadsafe buffer for a component's input frames.
+
+    By default the buffer size is unlimited. Use :py:meth:`set_limit`
+    to limit it. When the buffer is full a new frame is handled
+    according to the buffer's ``policy``:
+
+    * ``'block'`` -- the sending component waits until there is space
+      in the buffer.
+    * ``'drop_oldest'`` -- the oldest waiting frame is discarded. (The
+      frame at the head of the queue may already be in use, so the
+      next oldest is discarded. This policy needs a ``capacity`` of at
+      least 2.)
+    * ``'drop_newest'`` -- the new frame is discarded.
+
+    A ``None`` input (end of stream) is never blocked or dropped.
+
+    :ivar int high_water: The largest number of frames that have been
+        in the buffer.
+
+    :ivar int dropped: The number of frames that have been discarded.
+
+    """
+    policies = ('block', 'drop_oldest', 'drop_newest')
+
     def __init__(self, notify):
         self.notify = notify
         self.queue = deque()
+        self.capacity = 0
+        self.policy = 'block'
+        self.high_water = 0
+        self.dropped = 0
+        self._space = threading.Condition()
+
+    def set_limit(self, capacity, policy='block'):
+        """Limit the number of frames the buffer can hold.
+
+        :param int capacity: Maximum number of frames. Use zero for
+            an unlimited buffer.
+
+        :param str policy: What to do when the buffer is full.
+
+        """
+        if policy not in self.policies:
+            raise ValueError('Unknown input buffer policy %s' % policy)
+        if policy == 'drop_oldest' and capacity == 1:
+            raise ValueError('drop_oldest policy needs capacity of 2 or more')
+        with self._space:
+            self.capacity = capacity
+            self.policy = policy
+            self._space.notify_all()
 
     def input(self, frame):
-        self.queue.append(frame)
+        with self._space:
+            if frame is not None and self.capacity:
+                if self.policy == 'block':
+                    while self.capacity and len(self.queue) >= self.capacity:
+                        self._space.wait()
+                elif len(self.queue) >= self.capacity:
+                    self.dropped += 1
+                    if self.policy == 'drop_newest':
+                        return
+                    del self.queue[1]
+            self.queue.append(frame)
+            self.high_water = max(self.high_water, len(self.queue))
         self.notify()
 
     def available(self):
@@ -55,9 +119,16 @@ class InputBuffer(object):
         return self.queue[0]
 
     def get(self):
-        if not self.queue:
-            return None
-        return self.queue.popleft()
+        with self._space:
+            if not self.queue:
+                return None
+            frame = self.queue.popleft()
+            self._space.notify()
+        return frame
+
+    def close(self):
+        """Remove any limit, releasing blocked senders."""
+        self.set_limit(0)
 
 
 class Component(Actor, ConfigMixin):
@@ -69,11 +140,13 @@ class Component(Actor, ConfigMixin):
     :py:attr:`inputs` and :py:attr:`outputs`. Redefine these
     attributes if your component has different inputs and outputs.
 
-    The base class creates a threadsafe input buffer for each of your
-    :py:attr:`inputs`. This allows each component to run in its own
-    thread. It also creates a "do nothing" method for each of your
-    :py:attr:`outputs`. These output methods are bound to other
-    components' input methods when the components are connected.
+    The base class creates a threadsafe :py:class:`InputBuffer` for
+    each of your :py:attr:`inputs`. This allows each component to run
+    in its own thread. The buffers' size is unlimited unless
+    :py:meth:`set_input_limit` is used. It also creates a "do nothing"
+    method for each of your :py:attr:`outputs`. These output methods
+    are bound to other components' input methods when the components
+    are connected.
 
     To help with load balancing, components can have a limited size
     :py:class:`ObjectPool` of output :py:class:`~.frame.Frame`
@@ -81,12 +154,21 @@ class Component(Actor, ConfigMixin):
     :py:attr:`with_outframe_pool` to ``True``. The base class creates
     an output frame pool for each of your :py:attr:`outputs`.
 
+    Every component also has an :py:class:`ArrayPool`
+    (:py:attr:`array_pool`) that recycles the
+    :py:class:`numpy:numpy.ndarray` storage of old output frames. Use
+    this instead of allocating a new array for every frame.
+
     A :py:class:`logging.Logger` object is created for every
     component. Use this to report any errors or warnings from your
     component, rather than using ``print`` statements. The component
     may get used in situations where there is no console to print
     messages to.
 
+    Instead of running in its own thread a component can be run by a
+    :py:class:`~.scheduler.Scheduler`'s pool of worker threads. See
+    :py:meth:`set_scheduler` for details.
+
     Every component also has configuration methods. See
     :py:class:`~.config.ConfigMixin` for more information. The
     configuration can be initialised by passing appropriate key, value
@@ -101,6 +183,8 @@ class Component(Actor, ConfigMixin):
 
     :ivar logger: :py:class:`logging.Logger` object for the component.
 
+    :ivar ArrayPool array_pool: Source of recycled output arrays.
+
     :param dict config: Initial configuration values.
 
     """
@@ -112,8 +196,20 @@ class Component(Actor, ConfigMixin):
         super(Component, self).__init__()
         ConfigMixin.__init__(self)
         self.logger = logging.getLogger(self.__class__.__name__)
+        self._scheduler = None
+        self._priority = 0
+        self._stats = {
+            'frames'       : 0,
+            'process_time' : 0.0,
+            'max_time'     : 0.0,
+            'input_wait'   : 0.0,
+            'output_wait'  : 0.0,
+            }
+        self._stats_waiting = None
+        self._stats_wait_start = 0.0
         self.input_buffer = {}
         self.outframe_pool = {}
+        self.array_pool = ArrayPool()
         if self.with_outframe_pool:
             self.config['outframe_pool_len'] = ConfigInt(min_value=2, value=3)
         self.initialise()
@@ -135,6 +231,141 @@ class Component(Actor, ConfigMixin):
         """
         pass
 
+    def get_stats(self):
+        """Get the component's runtime statistics.
+
+        This can be called at any time, including while the component
+        is running. The result is a :py:class:`dict` with the
+        following items:
+
+        ================  =====  ====
+        ``frames``        int    Number of times :py:meth:`process_frame` has been called.
+        ``process_time``  float  Total time spent in :py:meth:`process_frame`.
+        ``max_time``      float  Longest time spent in one call of :py:meth:`process_frame`.
+        ``input_wait``    float  Total time spent waiting for input frames.
+        ``output_wait``   float  Total time spent waiting for frames from the outframe pool(s).
+        ``running``       bool   Whether the component is running.
+        ``pipe_end``      bool   Whether the component is the last in a pipeline. See :py:meth:`is_pipe_end`.
+        ``inputs``        dict   Queue length, high-water mark and dropped frame count of each :py:class:`InputBuffer`.
+        ================  =====  ====
+
+        Times are in seconds. Statistics are only collected by
+        components that use the base class :py:meth:`notify` method.
+
+        :rtype: :py:class:`dict`
+
+        """
+        result = dict(self._stats)
+        waiting, start = self._stats_waiting, self._stats_wait_start
+        if waiting:
+            # include current wait
+            result[waiting] += time.time() - start
+        result['running'] = self.is_alive()
+        result['pipe_end'] = self.is_pipe_end()
+        result['inputs'] = {}
+        for name, input in self.input_buffer.items():
+            result['inputs'][name] = {
+                'queued'     : input.available(),
+                'high_water' : input.high_water,
+                'dropped'    : input.dropped,
+                }
+        return result
+
+    def _stats_wait(self, waiting):
+        # record start or end of a wait for input or output frames
+        if waiting == self._stats_waiting:
+            return
+        now = time.time()
+        if self._stats_waiting:
+            self._stats[self._stats_waiting] += now - self._stats_wait_start
+        self._stats_waiting = waiting
+        self._stats_wait_start = now
+
+    def _stats_add_frame(self, duration):
+        self._stats['frames'] += 1
+        self._stats['process_time'] += duration
+        self._stats['max_time'] = max(self._stats['max_time'], duration)
+
+    def set_input_limit(self, capacity, policy='block', input=None):
+        """Limit the size of the component's input buffer(s).
+
+        See :py:class:`InputBuffer` for a description of the policies.
+
+        :param int capacity: Maximum number of frames in each buffer.
+            Use zero for an unlimited buffer.
+
+        :param str policy: What to do when a buffer is full. Can be
+            ``'block'``, ``'drop_oldest'`` or ``'drop_newest'``.
+
+        :param str input: The input to limit. If ``None`` all inputs
+            are limited.
+
+        The ``'block'`` policy can't be used with a limited size if the
+        component is run by a :py:class:`~.scheduler.Scheduler`. The
+        sender would wait in one of the scheduler's worker threads,
+        possibly preventing the component from ever being run to empty
+        its buffer.
+
+        """
+        if self._scheduler and capacity and policy == 'block':
+            raise ValueError(
+                'Cannot use block policy with a scheduler')
+        for name, buffer in self.input_buffer.items():
+            if input is None or name == input:
+                buffer.set_limit(capacity, policy)
+
+    def set_scheduler(self, scheduler, priority=0):
+        """Run the component on a thread pool instead of in its own
+        thread.
+
+        This must be called before the component is started. The
+        :py:meth:`start`, :py:meth:`stop` and :py:meth:`join` methods
+        work the same way with or without a scheduler.
+
+        :param Scheduler scheduler: The :py:class:`~.scheduler.Scheduler`
+            to use.
+
+        :param int priority: The component's priority. Components with
+            larger values are run first when several are ready.
+
+        Input buffers with a size limit must use a ``'drop_oldest'``
+        or ``'drop_newest'`` policy. See :py:meth:`set_input_limit`.
+
+        """
+        for buffer in self.input_buffer.values():
+            if buffer.capacity and buffer.policy == 'block':
+                raise ValueError(
+                    'Cannot use block policy with a scheduler')
+        self._scheduler = scheduler
+        self._priority = priority
+
+    def start(self):
+        if self._scheduler:
+            self._scheduler.start(self, self._priority)
+        else:
+            super(Component, self).start()
+
+    def stop(self):
+        super(Component, self).stop()
+        if self._scheduler:
+            self._scheduler.schedule(self)
+
+    def join(self, timeout=None):
+        if self._scheduler:
+            self._scheduler.join(self, timeout)
+        else:
+            super(Component, self).join(timeout)
+
+    def is_alive(self):
+        if self._scheduler:
+            return self._scheduler.is_alive(self)
+        return super(Component, self).is_alive()
+
+    def _actor_notify(self):
+        # called by guild whenever a method invocation is queued
+        if self._scheduler:
+            self._scheduler.schedule(self)
+
     def process_start(self):
         """Set up the outframe pool(s), if
         :py:attr:`with_outframe_pool` is ``True``
@@ -148,6 +379,9 @@ class Component(Actor, ConfigMixin):
             for output in self.outputs:
                 self.outframe_pool[output] = ObjectPool(
                     Frame, self.config['outframe_pool_len'], self.notify)
+            # allow for arrays still being used by "pass through"
+            # components downstream
+            self.array_pool.size = self.config['outframe_pool_len'] + 2
 
     def is_pipe_end(self):
         """Is component the last one in a pipeline.
@@ -195,10 +429,12 @@ class Component(Actor, ConfigMixin):
         # check output frames are available
         for output in self.outframe_pool.values():
             if not output.available():
+                self._stats_wait('output_wait')
                 return
         # check input frames are available
         for input in self.input_buffer.values():
             if not input.available():
+                self._stats_wait('input_wait')
                 return
         # test for 'None' input, and get current frame number
         frame_no = -1
@@ -223,7 +459,10 @@ class Component(Actor, ConfigMixin):
                 OK = False
         if OK:
             # now have a full set of correlated inputs to process
+            self._stats_wait(None)
+            start = time.time()
             self.process_frame()
+            self._stats_add_frame(time.time() - start)
         # might be more on the queue
         self.notify()
 
@@ -248,6 +487,10 @@ class Component(Actor, ConfigMixin):
 
     def onStop(self):
         self.logger.debug('stopping')
+        self._stats_wait(None)
+        # don't leave upstream components blocked
+        for input in self.input_buffer.values():
+            input.close()
         super(Component, self).onStop()
 
 
@@ -286,6 +529,11 @@ class Transformer(Component):
         input :py:class:`~.frame.Frame` -- it might be being used by
         another component running in parallel!
 
+        The new image's storage can be obtained from
+        :py:attr:`~Component.array_pool`, e.g.::
+
+            out_frame.data = self.array_pool.get(shape, pt_float)
+
         Return ``True`` if your processing was successful. Otherwise
         return ``False``, after logging an appropriate error message.
 
@@ -363,3 +611,51 @@ class ObjectPool(object):
         if self.obj_list:
             return self.obj_list.popleft()
         return None
+
+
+class ArrayPool(object):
+    """Recycle :py:class:`numpy:numpy.ndarray` storage.
+
+    Allocating a new array for every output frame is expensive for
+    large images. An :py:class:`ArrayPool` keeps a few arrays of each
+    shape and type, and reuses an array once nothing else refers to
+    it. (Python's reference count is used to determine this, so views
+    of an array, or frames using it, prevent it being reused.)
+
+    The array contents are not initialised -- they will usually hold
+    an old image.
+
+    :param int size: The maximum number of arrays of each shape and
+        type to keep.
+
+    """
+    def __init__(self, size=4):
+        super(ArrayPool, self).__init__()
+        self.size = size
+        self.arrays = OrderedDict()
+
+    def get(self, shape, dtype):
+        """Get an array from the pool.
+
+        :param tuple shape: The required array shape.
+
+        :param numpy.dtype dtype: The required array data type.
+
+        :rtype: :py:class:`numpy:numpy.ndarray`
+
+        """
+        key = tuple(shape), numpy.dtype(dtype).str
+        if key not in self.arrays:
+            # forget old shapes, e.g. after a config change
+            while len(self.arrays) >= 8:
+                self.arrays.popitem(last=False)
+            self.arrays[key] = []
+        arrays = self.arrays[key]
+        for array in arrays:
+            # references are 'arrays', 'array' and getrefcount's arg
+            if sys.getrefcount(array) <= 3:
+                return array
+        array = numpy.empty(key[0], dtype=dtype)
+        if len(arrays) < self.size:
+            arrays.append(array)
+        return array
@@ -22,8 +22,10 @@
 __docformat__ = 'restructuredtext en'
 
 import logging
+import time
 
 from .config import ConfigGrandParent
+from .frame import Frame
 
 class Compound(object):
     """Encapsulates several components into one. Closely modeled on
@@ -78,6 +80,18 @@ class Compound(object):
     This allows compound components to be nested to any depth whilst
     still making their configuration available at the top level.
 
+    Some components, such as
+    :py:class:`~pyctools.components.arithmetic.Arithmetic`, compute
+    each output pixel from the same input pixel only. Such a component
+    has an ``elementwise`` method. When its input comes from another
+    component in the same compound, each run of elementwise components
+    is processed in a single pass, a few lines at a time, by the last
+    component in the run. The others are not started. This avoids
+    creating a full size image at every step. Each component's
+    configuration and audit trail entry are the same as if it had run
+    separately. The last component's runtime statistics include the
+    whole run.
+
     :keyword Component name: Add ``Component`` to the network as
         ``name``. Can be repeated with different values of ``name``.
 
@@ -100,7 +114,21 @@ class Compound(object):
                 self._compound_children[key] = value
         # set up linkages
         self._compound_outputs = {}
+        self._compound_fused = set()
+        chains = self._elementwise_chains()
+        inputs = {}
+        for src, outbox, chain in chains:
+            # run the whole chain in the tail component's thread
+            tail = chain.names[-1]
+            self._compound_fused.update(chain.names[:-1])
+            for name in chain.names[1:]:
+                inputs[name] = None
+            inputs[chain.names[0]] = tail
         for (src, outbox), (dest, inbox) in self._compound_linkages.items():
+            if inbox == 'input' and dest in inputs:
+                dest = inputs[dest]
+                if dest is None:
+                    continue
             if src == 'self':
                 setattr(self, inbox,
                         getattr(self._compound_children[dest], inbox))
@@ -112,6 +140,37 @@ class Compound(object):
                 self._compound_children[src].bind(
                     outbox, self._compound_children[dest], inbox)
 
+    def _elementwise_chains(self):
+        # find runs of elementwise components that can be fused
+        sources = {}
+        for (src, outbox), (dest, inbox) in self._compound_linkages.items():
+            if inbox == 'input':
+                sources[dest] = (src, outbox)
+        fusable = set()
+        for name, child in self._compound_children.items():
+            if (hasattr(child, 'elementwise') and
+                    list(child.inputs) == ['input'] and
+                    list(child.outputs) == ['output'] and
+                    name in sources and sources[name][0] != 'self'):
+                fusable.add(name)
+        result = []
+        for name in sorted(fusable):
+            src, outbox = sources[name]
+            if src in fusable and outbox == 'output':
+                # not the start of a run
+                continue
+            names = [name]
+            while True:
+                dest, inbox = self._compound_linkages.get(
+                    (names[-1], 'output'), (None, None))
+                if dest not in fusable or inbox != 'input':
+                    break
+                names.append(dest)
+            self.logger.debug('fusing %s', ', '.join(names))
+            result.append((src, outbox, _ElementwiseChain(
+                names, [self._compound_children[x] for x in names])))
+        return result
+
     def bind(self, source, dest, destmeth):
         src, outbox = self._compound_outputs[source]
         self._compound_children[src].bind(outbox, dest, destmeth)
@@ -127,23 +186,158 @@ class Compound(object):
         for name, child_config in config.value.items():
             self._compound_children[name].set_config(child_config)
 
+    def get_stats(self):
+        """Get the child components' runtime statistics.
+
+        See :py:meth:`Component.get_stats
+        <pyctools.core.base.Component.get_stats>` for more detail.
+
+        :return: Child components' statistics, indexed by child name.
+
+        :rtype: :py:class:`dict`
+
+        """
+        result = {}
+        for name, child in self._compound_children.items():
+            if hasattr(child, 'get_stats'):
+                result[name] = child.get_stats()
+        return result
+
+    def set_input_limit(self, capacity, policy='block'):
+        """Limit the size of every child component's input buffers.
+
+        See :py:meth:`Component.set_input_limit
+        <pyctools.core.base.Component.set_input_limit>` for more
+        detail.
+
+        """
+        for name, child in self._compound_children.items():
+            if hasattr(child, 'set_input_limit'):
+                child.set_input_limit(capacity, policy)
+
+    def set_scheduler(self, scheduler, priority=0):
+        """Run the child components on a thread pool.
+
+        See :py:meth:`Component.set_scheduler
+        <pyctools.core.base.Component.set_scheduler>` for more
+        detail. Children that don't have a ``set_scheduler`` method
+        (such as
+        :py:class:`~pyctools.components.plumbing.busbar.Busbar`)
+        continue to run in their own threads.
+
+        :param Scheduler scheduler: The
+            :py:class:`~.scheduler.Scheduler` to use.
+
+        :param priority: Either a single priority value for all
+            children or a :py:class:`dict` of priorities indexed by
+            child name. Nested compounds can be given a nested
+            :py:class:`dict`.
+
+        """
+        for name, child in self._compound_children.items():
+            if not hasattr(child, 'set_scheduler'):
+                continue
+            if isinstance(priority, dict):
+                child.set_scheduler(scheduler, priority.get(name, 0))
+            else:
+                child.set_scheduler(scheduler, priority)
+
     def go(self):
         self.start()
         return self
 
     def start(self):
         for name, child in self._compound_children.items():
+            if name in self._compound_fused:
+                continue
             self.logger.debug('start %s (%s)', name, child.__class__.__name__)
             child.start()
 
     def stop(self):
         for name, child in self._compound_children.items():
+            if name in self._compound_fused:
+                continue
             self.logger.debug('stop %s (%s)', name, child.__class__.__name__)
             child.stop()
 
     def join(self, end_comps=False):
         for name, child in self._compound_children.items():
+            if name in self._compound_fused:
+                continue
             if end_comps and not child.is_pipe_end():
                 continue
             self.logger.debug('join %s (%s)', name, child.__class__.__name__)
             child.join()
+
+
+class _ElementwiseChain(object):
+    # Process frames with a run of elementwise components, in the
+    # thread of the last component in the run. The other components
+    # are not started.
+    block_size = 64 * 1024
+
+    def __init__(self, names, components):
+        self.names = names
+        self.components = components
+        self.tail = components[-1]
+        self.tail.process_frame = self.process_frame
+
+    def process_frame(self):
+        in_frame = self.tail.input_buffer['input'].get()
+        frame = in_frame
+        pending = []
+        for component in self.components:
+            start = time.time()
+            out_frame = Frame()
+            out_frame.initialise(frame)
+            kernel = component.elementwise(frame, out_frame)
+            frame = out_frame
+            if kernel:
+                pending.append((component, kernel, time.time() - start))
+                continue
+            # process a whole frame the usual way
+            self._apply(frame, pending, component)
+            pending = []
+            start = time.time()
+            out_frame = Frame()
+            out_frame.initialise(frame)
+            OK = component.transform(frame, out_frame)
+            frame = out_frame
+            self._add_stats(component, time.time() - start)
+            if not OK:
+                self.tail.output(None)
+                self.tail.stop()
+                return
+        self._apply(frame, pending, self.tail)
+        out_frame = self.tail.outframe_pool['output'].get()
+        out_frame.initialise(frame)
+        self.tail.output(out_frame)
+
+    def _add_stats(self, component, duration):
+        # the tail component's stats are recorded by its notify method
+        # and include the whole chain
+        if component is not self.tail:
+            component._stats_add_frame(duration)
+
+    def _apply(self, frame, pending, owner):
+        # apply elementwise kernels to a few lines at a time
+        if not pending:
+            return
+        in_data = frame.as_numpy()
+        ylen = in_data.shape[0]
+        step = max(1, self.block_size // max(1, in_data[0].size))
+        durations = [x[2] for x in pending]
+        out_data = None
+        for y in range(0, ylen, step):
+            data = in_data[y:y + step]
+            for n, (component, kernel, duration) in enumerate(pending):
+                start = time.time()
+                data = kernel(data)
+                durations[n] += time.time() - start
+            if out_data is None:
+                out_data = owner.array_pool.get(
+                    (ylen,) + data.shape[1:], data.dtype)
+            out_data[y:y + step] = data
+        frame.data = out_data
+        for (component, kernel, duration), total in zip(pending, durations):
+            self._add_stats(component, total)
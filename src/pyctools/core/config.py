@@ -56,6 +56,14 @@ configuration tree. This ensures that all your configuration changes
 are applied together, some time after calling
 :py:meth:`~ConfigMixin.set_config`.
 
+Each :py:meth:`~ConfigMixin.set_config` call creates a new version of
+the component's configuration. :py:meth:`~ConfigMixin.update_config`
+only has to compare version numbers to see if anything has changed.
+The copy returned by :py:meth:`~ConfigMixin.get_config` shares
+configuration nodes with the component until they are used or
+changed, so it is cheap to get a component's configuration even if
+only a few values are needed.
+
 .. autosummary::
    :nosignatures:
 
@@ -73,8 +81,9 @@ are applied together, some time after calling
 
 __docformat__ = 'restructuredtext en'
 
-import collections
 import copy
+import itertools
+import threading
 
 class ConfigLeafNode(object):
     """Base class for configuration nodes.
@@ -111,6 +120,14 @@ class ConfigLeafNode(object):
             raise ValueError(str(value))
         self.value = value
 
+    def copy(self):
+        """Return a copy of the config item.
+
+        The copy can be changed without affecting the original.
+
+        """
+        return copy.copy(self)
+
     def clip(self, value):
         """Return a limited value, for types that have maximum or
         minimum values.
@@ -209,20 +226,111 @@ class ConfigEnum(ConfigLeafNode):
         if not self.extendable:
             self.parser_kw['choices'] = self.choices
 
+    def copy(self):
+        result = super(ConfigEnum, self).copy()
+        result.choices = list(self.choices)
+        return result
+
     def validate(self, value):
         if self.extendable and value not in self.choices:
             self.choices.append(value)
         return value in self.choices
 
 
+class _SharedNodes(dict):
+    # dict of config nodes that may also be in use elsewhere, each of
+    # which is copied the first time it's accessed
+    def __init__(self, *args, **kw):
+        super(_SharedNodes, self).__init__(*args, **kw)
+        self._private = set()
+        self._lock = threading.Lock()
+
+    def __getitem__(self, key):
+        with self._lock:
+            if key not in self._private:
+                node = super(_SharedNodes, self).__getitem__(key).copy()
+                super(_SharedNodes, self).__setitem__(key, node)
+                self._private.add(key)
+            return super(_SharedNodes, self).__getitem__(key)
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            super(_SharedNodes, self).__setitem__(key, value)
+            self._private.add(key)
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def values(self):
+        return [self[key] for key in self]
+
+    def items(self):
+        return [(key, self[key]) for key in self]
+
+    def __reduce__(self):
+        return (_SharedNodes, (dict(self.items()),))
+
+
 class ConfigParent(ConfigLeafNode):
     """Parent configuration node.
 
     Stores a set of child nodes in a :py:class:`dict`.
 
     """
+    _share_stamps = itertools.count(1)
+
     def __init__(self):
         super(ConfigParent, self).__init__(value={})
+        self._shared = None
+        self._private = {}
+
+    def copy(self):
+        """Return a copy of the config tree.
+
+        The copy initially shares its child nodes with the original.
+        Each child node is copied when it is first used by the copy,
+        or when it is first changed by the original. The original's
+        child nodes are not replaced, so this can be called from any
+        thread.
+
+        """
+        result = copy.copy(self)
+        result._shared = None
+        result._private = {}
+        result.value = result.default = _SharedNodes(
+            list(dict.items(self.value)))
+        # original's nodes must be copied before being changed
+        self._shared = next(self._share_stamps)
+        return result
+
+    def _node(self, key):
+        # get a child node that is about to be changed, copying it
+        # first if it may be shared with a copy of this tree
+        node = self.value[key]
+        if self._shared is not None and self._private.get(key) != self._shared:
+            node = node.copy()
+            self.value[key] = node
+            self._private[key] = self._shared
+        return node
+
+    def deep_copy(self):
+        """Return a copy of the config tree that shares no nodes
+        with the original.
+
+        """
+        result = copy.copy(self)
+        result._shared = None
+        result._private = {}
+        result.value = result.default = {}
+        for key, value in dict.items(self.value):
+            if isinstance(value, ConfigParent):
+                value = value.deep_copy()
+            elif isinstance(value, ConfigLeafNode):
+                value = value.copy()
+            result.value[key] = value
+        return result
 
     def validate(self, value):
         return isinstance(value, dict)
@@ -240,14 +348,14 @@ class ConfigParent(ConfigLeafNode):
                 value = {parts[-1] : value}
                 del parts[-1]
             key = parts[0]
-            self.value[key].set(value)
+            self._node(key).set(value)
 
     def set(self, value):
         """Set the config item's value."""
         if not self.validate(value):
             raise ValueError(str(value))
         for k, v in value.items():
-            self.value[k].set(v)
+            self._node(k).set(v)
 
     def __repr__(self):
         result = {}
@@ -263,7 +371,7 @@ class ConfigParent(ConfigLeafNode):
         if isinstance(value, ConfigLeafNode):
             self.value[key] = value
         else:
-            self.value[key].set(value)
+            self._node(key).set(value)
 
 
 class ConfigGrandParent(ConfigParent):
@@ -280,9 +388,12 @@ class ConfigMixin(object):
     """Add a config tree to a pyctools component.
 
     """
+    _configmixin_versions = itertools.count(1)
+
     def __init__(self):
         self.config = ConfigParent()
-        self._configmixin_queue = collections.deque()
+        self._configmixin_version = 0
+        self._configmixin_latest = (0, None)
 
     def get_config(self):
         """Get a copy of the component's current configuration.
@@ -297,11 +408,11 @@ class ConfigMixin(object):
         :rtype: :py:class:`ConfigParent`
 
         """
-        # get any queued changes
+        # get any pending changes
         self.update_config()
         # make copy to allow changes without affecting running
         # component
-        return copy.deepcopy(self.config)
+        return self.config.copy()
 
     def set_config(self, config):
         """Update the component's configuration.
@@ -316,8 +427,9 @@ class ConfigMixin(object):
         :param ConfigParent config: New configuration.
 
         """
-        # put copy of config on queue for running component
-        self._configmixin_queue.append(copy.deepcopy(config))
+        # store new version of config for running component
+        self._configmixin_latest = (
+            next(self._configmixin_versions), config.deep_copy())
 
     def update_config(self):
         """Pull any changes made with :py:meth:`set_config`.
@@ -329,8 +441,9 @@ class ConfigMixin(object):
         :rtype: bool
 
         """
-        result = False
-        while self._configmixin_queue:
-            self.config = self._configmixin_queue.popleft()
-            result = True
-        return result
+        version, config = self._configmixin_latest
+        if version == self._configmixin_version:
+            return False
+        self.config = config
+        self._configmixin_version = version
+        return True
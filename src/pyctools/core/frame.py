@@ -23,10 +23,11 @@
 
    Frame
    Metadata
+   Audit
 
 """
 
-__all__ = ['Frame', 'Metadata']
+__all__ = ['Frame', 'Metadata', 'Audit']
 __docformat__ = 'restructuredtext en'
 
 try:
@@ -139,7 +140,9 @@ class Frame(object):
         form.
 
         Note that if the image data is already in the correct format
-        this is a null operation.
+        this is a null operation. Single component
+        :py:class:`numpy:numpy.ndarray` data is converted to a 2
+        dimensional array, as required by :py:mod:`PIL`.
 
         :return: The image data as :py:mod:`PIL.Image.Image
             <PIL.Image>`.
@@ -148,11 +151,12 @@ class Frame(object):
 
         """
         if isinstance(self.data, numpy.ndarray):
-            if self.data.dtype == numpy.uint8:
-                result = PIL.Image.fromarray(self.data)
-            else:
-                result = PIL.Image.fromarray(
-                    self.data.clip(0, 255).astype(numpy.uint8))
+            data = self.data
+            if data.ndim == 3 and data.shape[2] == 1:
+                data = data[:, :, 0]
+            if data.dtype != numpy.uint8:
+                data = data.clip(0, 255).astype(numpy.uint8)
+            result = PIL.Image.fromarray(data)
         elif isinstance(self.data, PIL.Image.Image):
             result = self.data
         else:
@@ -185,10 +189,41 @@ class Metadata(object):
     information is missing.
 
     """
+    _audit_tag = 'Xmp.pyctools.audit'
+
     def __init__(self):
-        self.data = {}
+        self._data = {}
+        self._shared = False
+        self._audit = ''
         self.comment = None
-        self.set('audit', '')
+
+    @property
+    def data(self):
+        """The metadata values, indexed by full tag name.
+
+        :py:meth:`copy` shares values between :py:class:`Metadata`
+        objects until one of them is changed, so using this attribute
+        makes a private copy first. Use :py:meth:`get` to read a
+        single value without copying.
+
+        """
+        self._unshare()
+        if self._audit is not None:
+            self._data[self._audit_tag] = str(self._audit)
+            self._audit = None
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self._data = value
+        self._shared = False
+        self._audit = None
+
+    def _unshare(self):
+        # make a private copy of shared values before changing them
+        if self._shared:
+            self._data = dict(self._data)
+            self._shared = False
 
     def from_file(self, path):
         """Read metadata from an XMP sidecar file or, if there is no
@@ -210,12 +245,15 @@ class Metadata(object):
                 md.open_path(xmp_path)
             except GObject.GError:
                 continue
+            self._unshare()
             for tag in (md.get_exif_tags() +
                         md.get_iptc_tags() + md.get_xmp_tags()):
                 if md.get_tag_type(tag) in ('XmpBag', 'XmpSeq'):
-                    self.data[tag] = md.get_tag_multiple(tag)
+                    self._data[tag] = md.get_tag_multiple(tag)
                 else:
-                    self.data[tag] = md.get_tag_string(tag)
+                    self._data[tag] = md.get_tag_string(tag)
+            if self._audit_tag in self._data:
+                self._audit = self._data[self._audit_tag]
             self.comment = md.get_comment()
             break
         return self
@@ -238,11 +276,14 @@ class Metadata(object):
         md.register_xmp_namespace(
             'https://github.com/jim-easterbrook/pyctools', 'pyctools')
         # copy metadata
-        for tag, value in self.data.items():
+        for tag, value in self._data.items():
+            if tag == self._audit_tag:
+                continue
             if md.get_tag_type(tag) in ('XmpBag', 'XmpSeq'):
                 md.set_tag_multiple(tag, value)
             else:
                 md.set_tag_string(tag, value)
+        md.set_tag_string(self._audit_tag, str(self.get_audit()))
         if self.comment is not None:
             md.set_comment(self.comment)
         # save file
@@ -262,7 +303,17 @@ class Metadata(object):
 
         """
         # copy from other to self
-        self.data.update(other.data)
+        audit = other.get_audit()
+        if all(tag in other._data or tag == self._audit_tag
+               for tag in self._data):
+            # share other's values until one of them is changed
+            self._data = other._data
+            self._shared = True
+            other._shared = True
+        else:
+            self._unshare()
+            self._data.update(other._data)
+        self._audit = audit
         if other.comment is not None:
             self.comment = other.comment
         return self
@@ -284,13 +335,13 @@ class Metadata(object):
         ylen = None
         for tag in ('Xmp.pyctools.xlen', 'Exif.Photo.PixelXDimension',
                     'Exif.Image.ImageWidth', 'Xmp.tiff.ImageWidth'):
-            if tag in self.data:
-                xlen = int(self.data[tag])
+            if tag in self._data:
+                xlen = int(self._data[tag])
                 break
         for tag in ('Xmp.pyctools.ylen', 'Exif.Photo.PixelYDimension',
                     'Exif.Image.ImageLength', 'Xmp.tiff.ImageLength'):
-            if tag in self.data:
-                ylen = int(self.data[tag])
+            if tag in self._data:
+                ylen = int(self._data[tag])
                 break
         if xlen and ylen:
             return xlen, ylen
@@ -312,8 +363,10 @@ class Metadata(object):
 
         """
         full_tag = 'Xmp.pyctools.' + tag
-        if full_tag in self.data:
-            return self.data[full_tag]
+        if full_tag == self._audit_tag:
+            return str(self.get_audit())
+        if full_tag in self._data:
+            return self._data[full_tag]
         return default
 
     def set(self, tag, value):
@@ -330,4 +383,133 @@ class Metadata(object):
 
         """
         full_tag = 'Xmp.pyctools.' + tag
-        self.data[full_tag] = value
+        if full_tag == self._audit_tag:
+            self.set_audit(value)
+            return
+        self._unshare()
+        self._data[full_tag] = value
+
+    def get_audit(self):
+        """Get the audit trail.
+
+        :rtype: :py:class:`Audit`
+
+        """
+        value = self._audit
+        if value is None:
+            value = self._data.get(self._audit_tag, '')
+        if not isinstance(value, Audit):
+            value = Audit.join(value)
+        self._audit = value
+        return value
+
+    def set_audit(self, audit):
+        """Set the audit trail.
+
+        :param Audit audit: The new audit trail.
+
+        """
+        self._audit = audit
+
+    def extend_audit(self, *items):
+        """Add to the end of the audit trail.
+
+        This is the usual way for a component to record what it has
+        done::
+
+            out_frame.metadata.extend_audit('data = Resize(data)\n')
+
+        See :py:meth:`Audit.join` for a description of ``items``.
+
+        """
+        self.set_audit(Audit.join(self.get_audit(), *items))
+
+
+class Audit(object):
+    """Immutable node of an audit trail.
+
+    Each node is made of a sequence of items, each of which is a
+    string or another :py:class:`Audit` node. Nodes are shared between
+    frames and between components, so the audit trail of a long
+    processing pipeline is not copied for each frame. The text is only
+    created when it's needed, e.g. when the
+    :py:class:`~pyctools.components.io.dumpmetadata.DumpMetadata`
+    component prints it or :py:meth:`Metadata.to_file` saves it, and is
+    then kept for reuse.
+
+    Components that combine several inputs include the input frames'
+    audit trails as items. For example,
+    :py:class:`~pyctools.components.adder.Adder` does this::
+
+        out_frame.metadata.set_audit(Audit.join(
+            'input0 = {\n', in_frame1.metadata.get_audit(), '}\n',
+            'input1 = {\n', in_frame2.metadata.get_audit(), '}\n',
+            'data = input0 + input1\n'))
+
+    """
+    _joined = {}
+
+    def __init__(self, *items):
+        self.items = items
+        self._text = None
+        self._joined = {}
+
+    @staticmethod
+    def join(*items):
+        """Create a node from a sequence of items.
+
+        If the same items (strings with the same value, or the same
+        :py:class:`Audit` nodes) were joined before then the previous
+        node is returned. Components whose configuration hasn't
+        changed therefore output the same node for every frame.
+
+        :param items: Strings and/or :py:class:`Audit` nodes.
+
+        :rtype: :py:class:`Audit`
+
+        """
+        key = []
+        owner = None
+        for item in items:
+            if isinstance(item, Audit):
+                if owner is None:
+                    owner = item
+                key.append(id(item))
+            else:
+                key.append(item)
+        if owner is None:
+            # text only, e.g. from a sidecar file
+            owner = Audit
+        key = tuple(key)
+        result = owner._joined.get(key)
+        if result is None:
+            result = Audit(*items)
+            if len(owner._joined) >= 16:
+                owner._joined.clear()
+            owner._joined[key] = result
+        return result
+
+    def __str__(self):
+        if self._text is None:
+            self._text = ''.join(str(item) for item in self.items)
+        return self._text
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if not isinstance(other, Audit):
+            return NotImplemented
+        return str(self) == str(other)
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    def __hash__(self):
+        return hash(str(self))
+
+    def __reduce__(self):
+        # don't pickle the cache of joined nodes
+        return (Audit, self.items)
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+#  Pyctools - a picture processing algorithm development kit.
+#  http://github.com/jim-easterbrook/pyctools
+#  Copyright (C) 2014  Jim Easterbrook  jim@jim-easterbrook.me.uk
+#
+#  This program is free software: you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation, either version 3 of the
+#  License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#  General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see
+#  <http://www.gnu.org/licenses/>.
+
+"""Keep decoded frames in memory.
+
+When a short clip is played repeatedly (e.g. with ``looping`` set to
+``'repeat'`` while adjusting an algorithm's parameters) there is no
+need to read and decode every frame each time. File reader components
+with a ``cache`` config item store the data of each frame they read in
+a :py:class:`FrameCache` shared by all components in the process. The
+next time the same frame of the same file (with the same reader
+configuration) is wanted it is taken from the cache.
+
+The cache has a size limit in bytes. When it is full the least
+recently used frames are discarded. Each component's ``cache`` value
+is the size (in MiB) it would like the cache to be, and the shared
+cache uses the largest value requested.
+
+Cached data is shared by every frame that uses it, so (as always) a
+component must not modify its input frames' data.
+
+.. autosummary::
+
+   FrameCache
+
+"""
+
+__all__ = ['FrameCache']
+__docformat__ = 'restructuredtext en'
+
+from collections import OrderedDict
+import threading
+
+import numpy
+
+class FrameCache(object):
+    """Threadsafe least recently used cache of frame data.
+
+    Each item is stored with a key, such as a tuple of file path,
+    modification time, reader configuration and frame number. The
+    value can be anything, but its size is computed from any
+    :py:class:`numpy:numpy.ndarray` objects it contains (or that are
+    contained in a tuple or list) unless ``nbytes`` is passed to
+    :py:meth:`put`.
+
+    :param int max_bytes: The size limit.
+
+    :ivar int hits: The number of successful :py:meth:`get` calls.
+
+    :ivar int misses: The number of unsuccessful :py:meth:`get` calls.
+
+    """
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, max_bytes=0):
+        super(FrameCache, self).__init__()
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls):
+        """Get the cache shared by all components.
+
+        :rtype: :py:class:`FrameCache`
+
+        """
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def reserve(self, max_bytes):
+        """Increase the size limit to at least ``max_bytes``.
+
+        :param int max_bytes: The required size.
+
+        """
+        with self._lock:
+            self.max_bytes = max(self.max_bytes, max_bytes)
+
+    def get(self, key):
+        """Get an item, if it's in the cache.
+
+        :return: The cached value, or ``None``.
+
+        """
+        with self._lock:
+            if key not in self._items:
+                self.misses += 1
+                return None
+            # move to end of list, as most recently used
+            value, nbytes = self._items.pop(key)
+            self._items[key] = value, nbytes
+            self.hits += 1
+            return value
+
+    def put(self, key, value, nbytes=None):
+        """Add an item to the cache.
+
+        Older items are discarded to make room if necessary. Items
+        bigger than the size limit are not stored.
+
+        :param key: The item's key. Must be hashable.
+
+        :param value: The item.
+
+        :param int nbytes: The item's size. If ``None`` it is computed
+            from the item's arrays.
+
+        """
+        if nbytes is None:
+            nbytes = _size_of(value)
+        with self._lock:
+            if key in self._items:
+                self.nbytes -= self._items.pop(key)[1]
+            if nbytes > self.max_bytes:
+                return
+            while self._items and self.nbytes + nbytes > self.max_bytes:
+                self.nbytes -= self._items.popitem(last=False)[1][1]
+            self._items[key] = value, nbytes
+            self.nbytes += nbytes
+
+    def clear(self):
+        """Discard all items."""
+        with self._lock:
+            self._items.clear()
+            self.nbytes = 0
+
+
+def _size_of(value):
+    if isinstance(value, numpy.ndarray):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sum(_size_of(x) for x in value)
+    return 0
@@ -0,0 +1,294 @@
+#!/usr/bin/env python
+#  Pyctools - a picture processing algorithm development kit.
+#  http://github.com/jim-easterbrook/pyctools
+#  Copyright (C) 2014  Jim Easterbrook  jim@jim-easterbrook.me.uk
+#
+#  This program is free software: you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation, either version 3 of the
+#  License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#  General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see
+#  <http://www.gnu.org/licenses/>.
+
+"""Run a component in a separate process.
+
+Pyctools components run in threads, so components that do most of
+their work in Python (rather than in NumPy or Cython code that
+releases the GIL) can't run in parallel. The
+:py:class:`ProcessComponent` class runs a component (or a
+:py:class:`~.compound.Compound` component) in a separate Python
+process. In the "parent" process it looks like the component it
+replaces -- it has the same inputs, outputs and configuration, and is
+connected to other components in the usual way.
+
+For example, to run an :py:class:`~pyctools.components.arithmetic.Arithmetic`
+component in its own process::
+
+    arith = ProcessComponent(Arithmetic, func='data * pt_float(2.0)')
+
+The ``factory`` parameter can be a component class or any function
+that returns a component. It must be defined at module level, so the
+child process can import it.
+
+Image data is passed between processes in shared memory, using
+memory-mapped files in ``/dev/shm`` (if it exists). Only the frame
+number, type and metadata are pickled.
+
+Each input and output has a limited number of "credits". A frame can
+only be sent to the other process when a credit is available, and the
+credit is returned when the frame is deleted. This keeps the load
+balancing behaviour of the usual :py:class:`~.base.ObjectPool`.
+
+.. autosummary::
+
+   ProcessComponent
+
+"""
+
+__all__ = ['ProcessComponent']
+__docformat__ = 'restructuredtext en'
+
+import multiprocessing
+import os
+import tempfile
+import threading
+import weakref
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+from guild.actor import actor_method
+import numpy
+import PIL.Image
+
+from .base import Component
+from .frame import Frame
+
+_shm_dir = '/dev/shm'
+if not os.path.isdir(_shm_dir):
+    _shm_dir = None
+
+if hasattr(multiprocessing, 'get_context'):
+    _context = multiprocessing.get_context('spawn')
+else:
+    # Python 2 has no start method choice
+    _context = multiprocessing
+
+if hasattr(weakref, 'finalize'):
+    _finalize = weakref.finalize
+else:
+    _finalizers = set()
+
+    def _finalize(obj, func):
+        # call func when obj is deleted, keeping the weak reference
+        # alive until then
+        def callback(ref):
+            _finalizers.discard(ref)
+            func()
+        _finalizers.add(weakref.ref(obj, callback))
+
+def _encode(frame):
+    # convert a frame to a picklable message, with image data in
+    # shared memory
+    if frame is None:
+        return None
+    data = frame.data
+    if isinstance(data, PIL.Image.Image):
+        data = frame.as_numpy()
+    if isinstance(data, numpy.ndarray) and data.nbytes:
+        fd, path = tempfile.mkstemp(prefix='pyctools-', dir=_shm_dir)
+        os.close(fd)
+        shm = numpy.memmap(path, dtype=data.dtype, mode='w+', shape=data.shape)
+        shm[...] = data
+        del shm
+        data = ('shm', path, data.shape, data.dtype.str)
+    else:
+        data = ('obj', data)
+    return (frame.frame_no, frame.type, data,
+            frame.metadata.data, frame.metadata.comment)
+
+def _decode(message, credit):
+    # convert a message back to a frame, returning a credit when the
+    # frame is deleted
+    if message is None:
+        return None
+    frame = Frame()
+    frame.frame_no, frame.type, data, md_data, comment = message
+    if data[0] == 'shm':
+        kind, path, shape, dtype = data
+        shm = numpy.memmap(path, dtype=dtype, mode='r+', shape=shape)
+        os.unlink(path)
+        frame.data = shm.view(numpy.ndarray)
+    else:
+        frame.data = data[1]
+    frame.metadata.data = md_data
+    frame.metadata.comment = comment
+    _finalize(frame, credit.release)
+    return frame
+
+def _discard(message):
+    # delete shared memory of a message that will never be decoded
+    if message and message[2][0] == 'shm':
+        os.unlink(message[2][1])
+
+
+class _Sender(object):
+    def __init__(self, queue, output, credit):
+        self.queue = queue
+        self.output = output
+        self.credit = credit
+
+    def input(self, frame):
+        if frame is not None:
+            self.credit.acquire()
+        self.queue.put((self.output, _encode(frame)))
+
+
+def _child_main(factory, config, outputs, in_queue, out_queue,
+                in_credit, out_credit):
+    component = factory()
+    component.set_config(config)
+    for output in outputs:
+        component.bind(
+            output, _Sender(out_queue, output, out_credit[output]), 'input')
+    component.start()
+    while True:
+        if not component.is_alive():
+            # tell parent the component has stopped, as it may have
+            # no outputs to send an end marker on
+            out_queue.put('stopped')
+            break
+        try:
+            message = in_queue.get(timeout=0.1)
+        except queue.Empty:
+            continue
+        if message is None:
+            break
+        if message[0] == 'config':
+            component.set_config(message[1])
+        else:
+            kind, name, message = message
+            getattr(component, name)(_decode(message, in_credit[name]))
+    component.stop()
+    component.join()
+    out_queue.put(None)
+    # tidy up any unused frames
+    while not in_queue.empty():
+        message = in_queue.get()
+        if message and message[0] == 'frame':
+            _discard(message[2])
+
+
+class ProcessComponent(Component):
+    """Proxy for a component running in another process.
+
+    :param callable factory: A function (or class) that creates the
+        component.
+
+    :param int queue_len: The number of credits for each input and
+        output, i.e. the maximum number of frames that can be "in
+        flight" between the two processes.
+
+    :param dict config: Initial configuration values.
+
+    """
+    def __init__(self, factory, queue_len=3, **config):
+        self._factory = factory
+        self._queue_len = queue_len
+        self._process = None
+        super(ProcessComponent, self).__init__(**config)
+
+    def initialise(self):
+        # make a local instance to get inputs, outputs and config
+        component = self._factory()
+        self.inputs = list(component.inputs)
+        self.outputs = list(component.outputs)
+        self.config = component.get_config()
+
+    def set_config(self, config):
+        super(ProcessComponent, self).set_config(config)
+        # wake up actor to pass new config to other process
+        self.notify()
+
+    def process_start(self):
+        super(ProcessComponent, self).process_start()
+        self.update_config()
+        self._in_queue = _context.Queue()
+        self._out_queue = _context.Queue()
+        self._in_credit = {}
+        for name in self.inputs:
+            self._in_credit[name] = _context.Semaphore(self._queue_len)
+        self._out_credit = {}
+        for name in self.outputs:
+            self._out_credit[name] = _context.Semaphore(self._queue_len)
+        self._process = _context.Process(
+            target=_child_main,
+            args=(self._factory, self.config, self.outputs,
+                  self._in_queue, self._out_queue,
+                  self._in_credit, self._out_credit))
+        self._process.daemon = True
+        self._process.start()
+        self._receiver = threading.Thread(target=self._receive)
+        self._receiver.daemon = True
+        self._receiver.start()
+
+    def _receive(self):
+        # runs in its own thread, passing frames from the other process
+        # to this component's outputs
+        ended = set()
+        while True:
+            message = self._out_queue.get()
+            if message is None:
+                break
+            if message == 'stopped':
+                # component in other process has stopped
+                self.stop()
+                continue
+            output, message = message
+            if output in ended:
+                _discard(message)
+                continue
+            frame = _decode(message, self._out_credit[output])
+            getattr(self, output)(frame)
+            if frame is None:
+                ended.add(output)
+
+    @actor_method
+    def notify(self):
+        """notify()
+
+        Pass any new configuration and input frames to the other
+        process.
+
+        """
+        if self.update_config():
+            self._in_queue.put(('config', self.config))
+        for name, input in self.input_buffer.items():
+            while input.available():
+                frame = input.peek()
+                if frame is not None:
+                    # wait for other process to release a frame
+                    while not self._in_credit[name].acquire(timeout=0.1):
+                        if self.killflag:
+                            return
+                input.get()
+                self._in_queue.put(('frame', name, _encode(frame)))
+
+    def onStop(self):
+        if self._process:
+            self._in_queue.put(None)
+            self._process.join(5.0)
+            if self._process.is_alive():
+                self.logger.warning('terminating child process')
+                self._process.terminate()
+                self._out_queue.put(None)
+            self._receiver.join(5.0)
+        super(ProcessComponent, self).onStop()
@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+#  Pyctools - a picture processing algorithm development kit.
+#  http://github.com/jim-easterbrook/pyctools
+#  Copyright (C) 2014  Jim Easterbrook  jim@jim-easterbrook.me.uk
+#
+#  This program is free software: you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation, either version 3 of the
+#  License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#  General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see
+#  <http://www.gnu.org/licenses/>.
+
+"""Process several frames at once.
+
+Many components, such as
+:py:class:`~pyctools.components.interp.resize.Resize` or
+:py:class:`~pyctools.components.fft.fft.FFT`, process each frame
+independently of any other. The :py:class:`Parallel` component runs
+several copies (or "replicas") of such a component, each processing a
+different frame. The output frames are put back into the correct
+order before being sent on.
+
+For example, to run 8 resizers in parallel::
+
+    resize = Parallel(Resize, replicas=8, xup=2, yup=2)
+
+The ``factory`` parameter can be a component class or any function
+that returns a component. It should create a component that produces
+one output frame (on each output) for every input frame and keeps no
+state from one frame to the next.
+
+Input frames are given to replica number ``frame_no % replicas``, so
+co-timed frames on different inputs go to the same replica. Frames
+with a negative frame number (such as a
+:py:class:`~pyctools.components.interp.resize.Resize` component's
+filter input) are given to every replica. If a replica doesn't output
+a frame, the frame is skipped as soon as that replica outputs a later
+one.
+
+The :py:class:`Parallel` component has the same configuration as the
+component it replicates. When the configuration is changed no more
+frames are given to the replicas until all frames in progress have
+been output. The new configuration is then applied to every replica,
+so every frame is processed with a consistent configuration.
+
+.. autosummary::
+
+   Parallel
+
+"""
+
+__all__ = ['Parallel']
+__docformat__ = 'restructuredtext en'
+
+from collections import deque
+
+from guild.actor import actor_method
+
+from .base import Component
+
+class _Collector(object):
+    def __init__(self, owner, output, replica):
+        self.owner = owner
+        self.output = output
+        self.replica = replica
+
+    def input(self, frame):
+        self.owner.collect(self.output, self.replica, frame)
+
+
+class Parallel(Component):
+    """Run several replicas of a component.
+
+    :param callable factory: A function (or class) that creates the
+        component.
+
+    :param int replicas: The number of replicas to create.
+
+    :param dict config: Initial configuration values.
+
+    """
+    def __init__(self, factory, replicas=4, **config):
+        self._replicas = []
+        for n in range(replicas):
+            self._replicas.append(factory())
+        super(Parallel, self).__init__(**config)
+        for n, replica in enumerate(self._replicas):
+            for output in self.outputs:
+                replica.bind(output, _Collector(self, output, n), 'input')
+        self._config_pending = True
+        self._last_frame_no = None
+        self._expected = {}
+        self._done = {}
+        self._ended = {}
+        self._latest = {}
+        for output in self.outputs:
+            self._expected[output] = deque()
+            self._done[output] = {}
+            self._ended[output] = set()
+            self._latest[output] = {}
+
+    def initialise(self):
+        self.inputs = list(self._replicas[0].inputs)
+        self.outputs = list(self._replicas[0].outputs)
+        self.config = self._replicas[0].get_config()
+
+    def set_config(self, config):
+        super(Parallel, self).set_config(config)
+        # wake up actor to pass new config to replicas
+        self.notify()
+
+    def set_scheduler(self, scheduler, priority=0):
+        super(Parallel, self).set_scheduler(scheduler, priority)
+        for replica in self._replicas:
+            replica.set_scheduler(scheduler, priority)
+
+    def start(self):
+        for replica in self._replicas:
+            replica.start()
+        super(Parallel, self).start()
+
+    def stop(self):
+        super(Parallel, self).stop()
+        for replica in self._replicas:
+            replica.stop()
+
+    def join(self, timeout=None):
+        super(Parallel, self).join(timeout)
+        for replica in self._replicas:
+            replica.join(timeout)
+
+    def get_stats(self):
+        result = super(Parallel, self).get_stats()
+        # add up replicas' processing statistics
+        result['replicas'] = []
+        for replica in self._replicas:
+            stats = replica.get_stats()
+            result['replicas'].append(stats)
+            result['frames'] += stats['frames']
+            result['process_time'] += stats['process_time']
+            result['max_time'] = max(result['max_time'], stats['max_time'])
+        return result
+
+    def _in_progress(self):
+        for expected in self._expected.values():
+            if expected:
+                return True
+        return False
+
+    @actor_method
+    def notify(self):
+        """notify()
+
+        Distribute input frames to the replicas.
+
+        """
+        if self.update_config():
+            self._config_pending = True
+        if self._config_pending:
+            if self._in_progress():
+                # wait for replicas to finish current frames
+                return
+            for replica in self._replicas:
+                replica.set_config(self.config)
+            self._config_pending = False
+        for name, input in self.input_buffer.items():
+            while input.available():
+                frame = input.get()
+                if frame is None or frame.frame_no < 0:
+                    for replica in self._replicas:
+                        getattr(replica, name)(frame)
+                    continue
+                if (self._last_frame_no is None or
+                        frame.frame_no > self._last_frame_no):
+                    # first input with this frame number
+                    self._last_frame_no = frame.frame_no
+                    for expected in self._expected.values():
+                        expected.append(frame.frame_no)
+                replica = self._replicas[frame.frame_no % len(self._replicas)]
+                getattr(replica, name)(frame)
+
+    @actor_method
+    def collect(self, output, replica, frame):
+        """collect(output, replica, frame)
+
+        Receive a frame from a replica and send on any frames that are
+        now in the correct order.
+
+        """
+        expected = self._expected[output]
+        done = self._done[output]
+        ended = self._ended[output]
+        latest = self._latest[output]
+        if len(ended) >= len(self._replicas):
+            # already finished
+            return
+        if frame is None:
+            ended.add(replica)
+        else:
+            done[frame.frame_no] = frame
+            latest[replica] = frame.frame_no
+        while expected:
+            frame_no = expected[0]
+            if frame_no in done:
+                getattr(self, output)(done.pop(expected.popleft()))
+                continue
+            # replicas output frames in order, so skip a frame if its
+            # replica has already sent a later one or has ended
+            n = frame_no % len(self._replicas)
+            if n in ended or latest.get(n, frame_no) > frame_no:
+                expected.popleft()
+                continue
+            break
+        if len(ended) >= len(self._replicas):
+            # all replicas have finished
+            for frame_no in sorted(done):
+                getattr(self, output)(done.pop(frame_no))
+            expected.clear()
+            getattr(self, output)(None)
+            for ended in self._ended.values():
+                if len(ended) < len(self._replicas):
+                    return
+            self.stop()
+            return
+        if self._config_pending and not self._in_progress():
+            self.notify()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+#  Pyctools - a picture processing algorithm development kit.
+#  http://github.com/jim-easterbrook/pyctools
+#  Copyright (C) 2014  Jim Easterbrook  jim@jim-easterbrook.me.uk
+#
+#  This program is free software: you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation, either version 3 of the
+#  License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#  General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see
+#  <http://www.gnu.org/licenses/>.
+
+"""Thread pool scheduler.
+
+Normally every Pyctools component runs in its own thread. In a large
+network most of these threads spend most of their time waiting for
+input or output frames. The :py:class:`Scheduler` class provides an
+alternative in which components are run by a fixed number of "worker"
+threads.
+
+A component is only given to a worker when it has something to do,
+i.e. when an input frame has arrived or an output frame has been
+returned to its :py:class:`~.base.ObjectPool`. Components with a
+higher ``priority`` are given to workers first.
+
+To use a scheduler, call a component's (or compound component's)
+``set_scheduler`` method before starting it::
+
+    comp = Network().make()
+    comp.set_scheduler(Scheduler(workers=4))
+    comp.start()
+    comp.join(end_comps=True)
+
+The component's ``start``, ``stop`` and ``join`` methods are used in
+exactly the same way as before.
+
+.. autosummary::
+
+   Scheduler
+
+"""
+
+__all__ = ['Scheduler']
+__docformat__ = 'restructuredtext en'
+
+import heapq
+import logging
+import threading
+
+class _Task(object):
+    def __init__(self, actor, priority):
+        self.actor = actor
+        self.priority = priority
+        self.generator = None
+        self.started = False
+        self.queued = False
+        self.running = False
+        self.wanted = False
+        self.done = threading.Event()
+
+
+class Scheduler(object):
+    """Run components on a pool of worker threads.
+
+    Each component is only run by one worker at a time, so components
+    written for the normal "one thread per component" model work
+    without change.
+
+    :param int workers: Number of worker threads.
+
+    :param int batch: Maximum number of queued method invocations a
+        component processes before giving its worker to another
+        component.
+
+    """
+    def __init__(self, workers=4, batch=8):
+        super(Scheduler, self).__init__()
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.workers = workers
+        self.batch = batch
+        self._cond = threading.Condition()
+        self._ready = []
+        self._tasks = {}
+        self._seq = 0
+        self._threads = []
+
+    def start(self, actor, priority=0):
+        """Start running a component.
+
+        :param Actor actor: The component to run.
+
+        :param int priority: The component's priority. Larger values
+            are run first.
+
+        """
+        with self._cond:
+            if actor in self._tasks:
+                raise RuntimeError('%s already started' % (
+                    actor.__class__.__name__))
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._worker)
+                thread.daemon = True
+                thread.start()
+                self._threads.append(thread)
+            task = _Task(actor, priority)
+            self._tasks[actor] = task
+            self._push(task)
+
+    def schedule(self, actor):
+        """Alert the scheduler that a component has something to do.
+
+        This is called by the component whenever one of its methods
+        is invoked from another thread. Components that have not been
+        started are ignored.
+
+        """
+        with self._cond:
+            task = self._tasks.get(actor)
+            if not task:
+                return
+            if task.running:
+                task.wanted = True
+            elif not task.queued:
+                self._push(task)
+
+    def is_alive(self, actor):
+        """Is a component still running.
+
+        :rtype: :py:class:`bool`
+
+        """
+        with self._cond:
+            return actor in self._tasks
+
+    def join(self, actor, timeout=None):
+        """Wait for a component to stop.
+
+        :param Actor actor: The component to wait for.
+
+        :param float timeout: Maximum time to wait, in seconds.
+
+        """
+        with self._cond:
+            task = self._tasks.get(actor)
+        if task:
+            task.done.wait(timeout)
+
+    def _push(self, task):
+        self._seq += 1
+        heapq.heappush(self._ready, (-task.priority, self._seq, task))
+        task.queued = True
+        self._cond.notify()
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._ready:
+                    self._cond.wait()
+                priority, seq, task = heapq.heappop(self._ready)
+                task.queued = False
+                task.running = True
+                task.wanted = False
+            more = self._run(task)
+            with self._cond:
+                task.running = False
+                if task.done.is_set():
+                    del self._tasks[task.actor]
+                elif more or task.wanted:
+                    self._push(task)
+
+    def _run(self, task):
+        # equivalent of one pass through guild's Actor.run loop
+        actor = task.actor
+        try:
+            if not task.started:
+                task.started = True
+                actor.process_start()
+                actor.process()
+                for name in ('main', 'gen_process'):
+                    if hasattr(actor, name):
+                        task.generator = getattr(actor, name)()
+                        break
+            for i in range(self.batch):
+                if actor.killflag or not actor._actor_do_queued():
+                    break
+            if task.generator and not actor.killflag:
+                try:
+                    next(task.generator)
+                except StopIteration:
+                    task.generator = None
+                    actor.stop()
+        except Exception as ex:
+            self.logger.exception(ex)
+            actor.stop()
+        if not actor.killflag:
+            return bool(actor.inbound or actor.F_inbound or
+                        actor.core or task.generator)
+        try:
+            actor.onStop()
+            if task.generator:
+                task.generator.close()
+        except Exception as ex:
+            self.logger.exception(ex)
+        task.done.set()
+        return False
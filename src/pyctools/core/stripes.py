@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+#  Pyctools - a picture processing algorithm development kit.
+#  http://github.com/jim-easterbrook/pyctools
+#  Copyright (C) 2014  Jim Easterbrook  jim@jim-easterbrook.me.uk
+#
+#  This program is free software: you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation, either version 3 of the
+#  License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#  General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see
+#  <http://www.gnu.org/licenses/>.
+
+"""Process horizontal stripes of a frame at once.
+
+Components that do their processing with NumPy only use one CPU core,
+however large the frame is. The :py:class:`Stripes` component splits
+each frame into horizontal stripes and processes them concurrently in
+a pool of threads (NumPy releases the GIL for most operations), then
+joins the results together.
+
+For example, to run a colour matrix on 4 stripes of each frame::
+
+    matrix = Stripes(Matrix, stripes=4)
+
+The ``factory`` parameter can be a component class or any function
+that returns a component. One instance is created for each stripe.
+The component must have a ``transform`` method that takes a frame
+from each of its inputs and an output frame, like a
+:py:class:`~.base.Transformer`. It must only have one output, with
+the same number of lines as its (first) input.
+
+The component must also have a ``vertical_support`` method. This
+returns a ``(above, below)`` tuple of the number of input lines above
+and below an output line that are used to compute it. Each stripe's
+input includes this many extra lines (where available) so the
+stripes join together without visible edges. If ``vertical_support``
+returns ``None`` the component can't be used on stripes with its
+current configuration, so each frame is processed whole.
+
+If the component has a ``set_frame_height`` method it is called with
+the number of lines in the whole (first input) frame before the
+frame's stripes are processed. Components whose processing depends on
+the image size, such as the ``'auto'`` matrix selection of
+:py:class:`~pyctools.components.colourspace.yuvtorgb.YUVtoRGB`, use
+this instead of the stripe's height.
+
+Inputs with a negative frame number (such as a
+:py:class:`~pyctools.components.colourspace.matrix.Matrix`
+component's matrix input) are shared by all the stripe components.
+Other inputs are split into stripes. An input with fewer lines than
+the first input (e.g. the subsampled UV input of a
+:py:class:`~pyctools.components.colourspace.yuvtorgb.YUVtoRGB`
+component) is split at the corresponding lines.
+
+The :py:class:`Stripes` component has the same configuration as the
+component it wraps.
+
+.. autosummary::
+
+   Stripes
+
+"""
+
+__all__ = ['Stripes']
+__docformat__ = 'restructuredtext en'
+
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+from .base import Component
+from .frame import Frame
+
+def _gcd(a, b):
+    while b:
+        a, b = b, a % b
+    return a
+
+
+class Stripes(Component):
+    """Process stripes of each frame concurrently.
+
+    :param callable factory: A function (or class) that creates the
+        component.
+
+    :param int stripes: The number of stripes to process at once.
+
+    :param dict config: Initial configuration values.
+
+    """
+    with_outframe_pool = True
+
+    def __init__(self, factory, stripes=4, **config):
+        self._replicas = []
+        for n in range(stripes):
+            self._replicas.append(factory())
+        self._pool = None
+        super(Stripes, self).__init__(**config)
+        self._config_pending = True
+        # stripe components read static inputs from our buffers
+        for replica in self._replicas:
+            for name in self.inputs:
+                replica.input_buffer[name] = self.input_buffer[name]
+
+    def initialise(self):
+        self.inputs = list(self._replicas[0].inputs)
+        self.outputs = list(self._replicas[0].outputs)
+        self.config = self._replicas[0].get_config()
+
+    def process_start(self):
+        super(Stripes, self).process_start()
+        self._pool = ThreadPoolExecutor(max(len(self._replicas) - 1, 1))
+
+    def onStop(self):
+        if self._pool:
+            self._pool.shutdown()
+        super(Stripes, self).onStop()
+
+    def get_stats(self):
+        result = super(Stripes, self).get_stats()
+        result['replicas'] = []
+        for replica in self._replicas:
+            result['replicas'].append(replica.get_stats())
+        return result
+
+    def process_frame(self):
+        if self.update_config():
+            self._config_pending = True
+        if self._config_pending:
+            for replica in self._replicas:
+                replica.set_config(self.config)
+            self._config_pending = False
+        # get correlated input frames, leave "static" ones in buffer
+        in_frames = []
+        for name in self.inputs:
+            input = self.input_buffer[name]
+            if input.peek().frame_no >= 0:
+                in_frames.append(input.get())
+        out_frame = self.outframe_pool[self.outputs[0]].get()
+        out_frame.initialise(in_frames[0])
+        if self.transform(in_frames, out_frame):
+            getattr(self, self.outputs[0])(out_frame)
+        else:
+            getattr(self, self.outputs[0])(None)
+            self.stop()
+
+    def transform(self, in_frames, out_frame):
+        support = self._replicas[0].vertical_support()
+        in_data = [x.as_numpy() for x in in_frames]
+        ylen = in_data[0].shape[0]
+        # stripe edges must be on a line of every input
+        align = 1
+        for data in in_data[1:]:
+            ratio = max(ylen // max(data.shape[0], 1), 1)
+            align = align * ratio // _gcd(align, ratio)
+        for replica in self._replicas:
+            if hasattr(replica, 'set_frame_height'):
+                replica.set_frame_height(ylen)
+        stripes = len(self._replicas)
+        if support is None or ylen < stripes * align * 2:
+            return self._replicas[0].transform(*(in_frames + [out_frame]))
+        above, below = support
+        above = -(-above // align) * align
+        below = -(-below // align) * align
+        edges = []
+        for n in range(stripes + 1):
+            edges.append(((ylen * n) // (stripes * align)) * align)
+        # process stripes concurrently, first one in this thread
+        jobs = []
+        for n, replica in enumerate(self._replicas):
+            y0, y1 = edges[n], edges[n + 1]
+            m0, m1 = max(y0 - above, 0), min(y1 + below, ylen)
+            frames = []
+            for frame, data in zip(in_frames, in_data):
+                ratio = max(ylen // max(data.shape[0], 1), 1)
+                stripe = Frame()
+                stripe.initialise(frame)
+                stripe.data = data[m0 // ratio:m1 // ratio]
+                frames.append(stripe)
+            stripe_out = Frame()
+            stripe_out.initialise(out_frame)
+            jobs.append((replica, frames, stripe_out, m1 - m0))
+        futures = []
+        for job in jobs[1:]:
+            futures.append(self._pool.submit(self._transform_stripe, *job))
+        results = [self._transform_stripe(*jobs[0])]
+        for future in futures:
+            results.append(future.result())
+        if not all(results):
+            return False
+        # join stripes together
+        out_data = None
+        for n, (replica, frames, stripe_out, lines) in enumerate(jobs):
+            y0, y1 = edges[n], edges[n + 1]
+            m0 = max(y0 - above, 0)
+            data = stripe_out.as_numpy()
+            if out_data is None:
+                out_data = self.array_pool.get(
+                    (ylen,) + data.shape[1:], data.dtype)
+                out_frame.type = stripe_out.type
+                out_frame.metadata.copy(stripe_out.metadata)
+            out_data[y0:y1] = data[y0 - m0:y1 - m0]
+        out_frame.data = out_data
+        return True
+
+    def _transform_stripe(self, replica, frames, stripe_out, lines):
+        start = time.time()
+        if not replica.transform(*(frames + [stripe_out])):
+            return False
+        replica._stats_add_frame(time.time() - start)
+        if stripe_out.as_numpy().shape[0] != lines:
+            self.logger.error('%s output has wrong number of lines',
+                              replica.__class__.__name__)
+            return False
+        return True
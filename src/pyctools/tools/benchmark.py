@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+#  Pyctools - a picture processing algorithm development kit.
+#  http://github.com/jim-easterbrook/pyctools
+#  Copyright (C) 2014  Jim Easterbrook  jim@jim-easterbrook.me.uk
+#
+#  This program is free software: you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation, either version 3 of the
+#  License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#  General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see
+#  <http://www.gnu.org/licenses/>.
+
+"""Benchmark image processing kernels.
+
+Times the resize, modulate and zone plate kernels, the RGB/YUV
+colour converters and the FFT component at SD, HD and UHD frame sizes.
+
+Results can be saved to a JSON file and compared with a previously
+saved baseline. The exit status is 1 if any benchmark is slower than
+its baseline by more than the tolerance.
+
+"""
+
+from __future__ import print_function
+
+import argparse
+from collections import OrderedDict
+import json
+import platform
+import sys
+import timeit
+
+import numpy
+
+from pyctools.core.frame import Frame
+from pyctools.core.types import pt_float
+
+sizes = OrderedDict((
+    ('SD',  (576, 720)),
+    ('HD',  (1080, 1920)),
+    ('UHD', (2160, 3840)),
+    ))
+
+def make_frame(ylen, xlen, comps, frame_type='RGB'):
+    frame = Frame()
+    frame.frame_no = 0
+    frame.data = numpy.random.uniform(
+        16.0, 235.0, (ylen, xlen, comps)).astype(pt_float)
+    frame.type = frame_type
+    return frame
+
+def resize_cases(size, ylen, xlen):
+    from pyctools.components.interp.filtergenerator import FilterGeneratorCore
+    from pyctools.components.interp.resize import resize_frame, resize_shape
+    for comps in (1, 3):
+        in_data = make_frame(ylen, xlen, comps).data
+        for up, down in ((1, 1), (2, 1), (1, 2), (3, 4)):
+            for aperture in (4, 8, 16):
+                fil = FilterGeneratorCore(
+                    x_up=up, x_down=down, x_ap=aperture,
+                    y_up=up, y_down=down, y_ap=aperture)
+                norm_filter = fil.as_numpy(dtype=pt_float) * pt_float(up * up)
+                out = numpy.empty(resize_shape(
+                    ylen, xlen, up, down, up, down) + (comps,), dtype=pt_float)
+                def func(in_data=in_data, norm_filter=norm_filter,
+                         up=up, down=down, out=out):
+                    resize_frame(in_data, norm_filter, up, down, up, down,
+                                 out=out)
+                yield 'resize/%s/%d/%d:%d/ap%d' % (
+                    size, comps, up, down, aperture), func
+
+def modulate_cases(size, ylen, xlen):
+    from pyctools.components.modulate.modulate import modulate_frame
+    for comps in (1, 3):
+        in_data = make_frame(ylen, xlen, comps).data
+        # Bayer filter cell
+        cell = numpy.array([[[[0, 0, 1], [0, 1, 0]],
+                             [[0, 1, 0], [1, 0, 0]]]], dtype=pt_float)
+        if comps == 1:
+            cell = cell[:, :, :, 1:2]
+        out = numpy.empty(in_data.shape, dtype=pt_float)
+        def func(in_data=in_data, cell=cell, out=out):
+            modulate_frame(in_data, cell, 0, out=out)
+        yield 'modulate/%s/%d' % (size, comps), func
+
+def zone_cases(size, ylen, xlen):
+    from pyctools.components.zone.zoneplategenerator import (
+        ZonePlateGenerator, zone_frame)
+    # zone plates only have one component
+    waveform = ZonePlateGenerator().waveform
+    out = numpy.empty((ylen, xlen, 1), dtype=pt_float)
+    def func(out=out, waveform=waveform):
+        zone_frame(out, waveform, 0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0,
+                   0.0, 1.0, 0.0, 0.0, 0.0, 0.0)
+    yield 'zone/%s/1' % size, func
+
+def colour_cases(size, ylen, xlen):
+    from pyctools.components.colourspace.rgbtoyuv import RGBtoYUV
+    from pyctools.components.colourspace.yuvtorgb import YUVtoRGB
+    comp = RGBtoYUV()
+    in_frame = make_frame(ylen, xlen, 3)
+    def func(comp=comp, in_frame=in_frame):
+        comp.transform(in_frame, Frame(), Frame())
+    yield 'RGBtoYUV/%s/3' % size, func
+    comp = YUVtoRGB()
+    Y_frame = make_frame(ylen, xlen, 1, 'Y')
+    for name, v_ss, h_ss in (('444', 1, 1), ('422', 1, 2), ('420', 2, 2)):
+        UV_frame = make_frame(ylen // v_ss, xlen // h_ss, 2, 'CbCr')
+        def func(comp=comp, Y_frame=Y_frame, UV_frame=UV_frame):
+            comp.transform(Y_frame, UV_frame, Frame())
+        yield 'YUVtoRGB/%s/%s' % (size, name), func
+
+def fft_cases(size, ylen, xlen):
+    from pyctools.components.fft.fft import FFT
+    for comps in (1, 3):
+        in_frame = make_frame(ylen, xlen, comps)
+        for tile in (0, 8):
+            comp = FFT()
+            cnf = comp.get_config()
+            cnf['xtile'] = tile
+            cnf['ytile'] = tile
+            comp.set_config(cnf)
+            def func(comp=comp, in_frame=in_frame):
+                comp.transform(in_frame, Frame())
+            yield 'FFT/%s/%d/tile%d' % (size, comps, tile), func
+
+all_cases = (resize_cases, modulate_cases, zone_cases,
+             colour_cases, fft_cases)
+
+def run(size_names, match, repeat):
+    """Run benchmarks and return a dict of results."""
+    results = OrderedDict()
+    for size in size_names:
+        ylen, xlen = sizes[size]
+        for cases in all_cases:
+            for name, func in cases(size, ylen, xlen):
+                if match and not any(m in name for m in match):
+                    continue
+                # first run includes any one-off setup costs
+                func()
+                times = timeit.repeat(func, repeat=repeat, number=1)
+                times.sort()
+                results[name] = {
+                    'min'    : times[0] * 1000.0,
+                    'median' : times[len(times) // 2] * 1000.0,
+                    }
+                print('%-32s %10.2f ms' % (name, results[name]['min']))
+                sys.stdout.flush()
+    return results
+
+def compare(results, baseline, tolerance):
+    """Print comparison with baseline and return number of regressions."""
+    regressions = 0
+    print('%-32s %10s %10s %8s' % ('benchmark', 'baseline', 'now', 'ratio'))
+    for name, value in results.items():
+        if name not in baseline:
+            continue
+        ratio = value['min'] / max(baseline[name]['min'], 1.0e-6)
+        flag = ''
+        if ratio > 1.0 + (tolerance / 100.0):
+            flag = ' SLOWER'
+            regressions += 1
+        elif ratio < 1.0 - (tolerance / 100.0):
+            flag = ' faster'
+        print('%-32s %10.2f %10.2f %8.2f%s' % (
+            name, baseline[name]['min'], value['min'], ratio, flag))
+    return regressions
+
+def main():
+    # get command args
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-s', '--size', action='append',
+                        choices=list(sizes.keys()),
+                        help='frame size (default all)')
+    parser.add_argument('-k', '--match', action='append', metavar='text',
+                        help='only run benchmarks whose name includes text')
+    parser.add_argument('-r', '--repeat', type=int, default=3,
+                        help='number of timed runs of each benchmark')
+    parser.add_argument('-o', '--output', metavar='path',
+                        help='save results to a JSON file')
+    parser.add_argument('-b', '--baseline', metavar='path',
+                        help='compare results with a JSON file')
+    parser.add_argument('-t', '--tolerance', type=float, default=10.0,
+                        help='allowed slow down, in percent (default 10)')
+    args = parser.parse_args()
+    results = run(args.size or list(sizes.keys()), args.match, args.repeat)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'platform'  : platform.platform(),
+                'python'    : platform.python_version(),
+                'numpy'     : numpy.__version__,
+                'results'   : results,
+                }, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        if compare(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
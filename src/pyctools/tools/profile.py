@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+#  Pyctools - a picture processing algorithm development kit.
+#  http://github.com/jim-easterbrook/pyctools
+#  Copyright (C) 2014  Jim Easterbrook  jim@jim-easterbrook.me.uk
+#
+#  This program is free software: you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation, either version 3 of the
+#  License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#  General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see
+#  <http://www.gnu.org/licenses/>.
+
+"""Profile a network.
+
+Runs a network saved by pyctools-editor for a number of frames, then
+prints a report of each component's processing time and the time it
+spent waiting for input frames or for output frames to be released.
+Components are listed in order of processing time, so the most likely
+bottleneck is at the top.
+
+"""
+
+import argparse
+import logging
+import sys
+import time
+
+from pyctools.core.scheduler import Scheduler
+
+def load_network(path):
+    """Create a network from a script saved by pyctools-editor."""
+    global_vars = {'__name__': 'network'}
+    with open(path) as f:
+        code = compile(f.read(), path, 'exec')
+        exec(code, global_vars)
+    if 'Network' not in global_vars:
+        raise RuntimeError('Script not recognised: %s' % path)
+    return global_vars['Network']().make()
+
+def flatten_stats(stats, prefix=''):
+    """Convert nested compound component stats to a flat dict."""
+    result = {}
+    for name, value in stats.items():
+        if not value:
+            # component without stats
+            continue
+        if 'frames' in value:
+            result[prefix + name] = value
+        else:
+            result.update(flatten_stats(value, prefix + name + '.'))
+    return result
+
+def report(stats, elapsed):
+    print('Elapsed time %.2fs' % elapsed)
+    print('%-24s %7s %9s %9s %6s %6s %6s %6s' % (
+        'component', 'frames', 'ms/frame', 'max ms',
+        'busy%', 'in%', 'out%', 'queue'))
+    ranked = sorted(stats.items(),
+                    key=lambda x: x[1]['process_time'], reverse=True)
+    for name, value in ranked:
+        frames = value['frames']
+        queue = 0
+        for input in value['inputs'].values():
+            queue = max(queue, input['high_water'])
+        print('%-24s %7d %9.2f %9.2f %6.1f %6.1f %6.1f %6d' % (
+            name, frames,
+            value['process_time'] * 1000.0 / max(frames, 1),
+            value['max_time'] * 1000.0,
+            value['process_time'] * 100.0 / elapsed,
+            value['input_wait'] * 100.0 / elapsed,
+            value['output_wait'] * 100.0 / elapsed,
+            queue))
+    if ranked and ranked[0][1]['frames']:
+        print('Bottleneck: %s' % ranked[0][0])
+
+def main():
+    # get command args
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('script', help='network script file')
+    parser.add_argument('-n', '--frames', type=int, default=100,
+                        help='number of frames to process')
+    parser.add_argument('-w', '--workers', type=int, default=0,
+                        help='run on a pool of worker threads')
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help='show debug messages')
+    args = parser.parse_args()
+    logging.basicConfig(level=(logging.ERROR, logging.DEBUG)[args.verbose])
+    comp = load_network(args.script)
+    if args.workers:
+        comp.set_scheduler(Scheduler(workers=args.workers))
+    start = time.time()
+    comp.start()
+    # wait for every pipeline end to process enough frames, or stop
+    try:
+        while True:
+            time.sleep(0.1)
+            running = False
+            for value in flatten_stats(comp.get_stats()).values():
+                if (value.get('pipe_end') and value['running'] and
+                        value['frames'] < args.frames):
+                    running = True
+            if not running:
+                break
+    except KeyboardInterrupt:
+        pass
+    elapsed = time.time() - start
+    stats = flatten_stats(comp.get_stats())
+    comp.stop()
+    comp.join()
+    report(stats, elapsed)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+#  Pyctools - a picture processing algorithm development kit.
+#  http://github.com/jim-easterbrook/pyctools
+#  Copyright (C) 2014  Jim Easterbrook  jim@jim-easterbrook.me.uk
+#
+#  This program is free software: you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation, either version 3 of the
+#  License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#  General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see
+#  <http://www.gnu.org/licenses/>.
+
+"""Run a network on many input files.
+
+Runs a network saved by pyctools-editor once for each input file,
+without a GUI. The reader component's ``path`` is set to the input
+file for each job. Several jobs are run at once, each in its own
+process.
+
+Other configuration values can be set with the ``--set`` option, e.g.
+``--set writer.path=/tmp/{stem}.mp4``. The value can include
+``{path}``, ``{dir}``, ``{name}`` (file name), ``{stem}`` (file name
+without extension) and ``{job}`` (job number), which are replaced with
+values for each input file.
+
+"""
+
+import argparse
+import glob
+import logging
+import multiprocessing
+import os
+import sys
+import time
+
+from pyctools.tools.profile import flatten_stats, load_network
+
+def find_readers(comp):
+    """List the child components that have no inputs and a ``path``
+    config value.
+
+    """
+    cnf = comp.get_config()
+    stats = comp.get_stats()
+    result = []
+    for name, value in stats.items():
+        if (value and 'inputs' in value and not value['inputs'] and
+                'path' in cnf[name]):
+            result.append(name)
+    return sorted(result)
+
+def set_value(cnf, name, key, value):
+    """Set a child component's config value from a string, converting
+    it in the same way as a command line option.
+
+    """
+    node = cnf.value[name].value[key]
+    node.set(node.parser_kw.get('type', str)(value))
+
+def run_job(params):
+    """Run one job and return a dict of results."""
+    job, script, reader, path, settings = params
+    result = {'job': job, 'path': path, 'frames': 0, 'elapsed': 0.0,
+              'error': None}
+    try:
+        comp = load_network(script)
+        cnf = comp.get_config()
+        set_value(cnf, reader, 'path', path)
+        file_name = os.path.basename(path)
+        subs = {
+            'path' : path,
+            'dir'  : os.path.dirname(path),
+            'name' : file_name,
+            'stem' : os.path.splitext(file_name)[0],
+            'job'  : job,
+            }
+        for key, value in settings:
+            name, key = key.split('.', 1)
+            set_value(cnf, name, key, value.format(**subs))
+        comp.set_config(cnf)
+        start = time.time()
+        comp.start()
+        comp.join(end_comps=True)
+        result['elapsed'] = time.time() - start
+        comp.stop()
+        comp.join()
+        # count frames processed by pipeline ends
+        for value in flatten_stats(comp.get_stats()).values():
+            if value.get('pipe_end'):
+                result['frames'] = max(result['frames'], value['frames'])
+    except Exception as ex:
+        result['error'] = '%s: %s' % (ex.__class__.__name__, str(ex))
+    return result
+
+def main():
+    # get command args
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('script', help='network script file')
+    parser.add_argument('inputs', nargs='+', metavar='input',
+                        help='input file or glob pattern')
+    parser.add_argument('-r', '--reader', metavar='name',
+                        help='component whose path is set for each job')
+    parser.add_argument('-s', '--set', action='append', default=[],
+                        metavar='name.key=value',
+                        help='set a component config value for each job')
+    parser.add_argument('-j', '--jobs', type=int,
+                        default=multiprocessing.cpu_count(),
+                        help='number of jobs to run at once')
+    parser.add_argument('-v', '--verbose', action='count', default=0,
+                        help='increase verbosity of log messages')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR - (args.verbose * 10))
+    # expand glob patterns
+    paths = []
+    for pattern in args.inputs:
+        matches = sorted(glob.glob(pattern))
+        if not matches:
+            print('No match for %s' % pattern)
+        paths += matches
+    if not paths:
+        return 1
+    settings = []
+    for item in args.set:
+        key, sep, value = item.partition('=')
+        if not sep or '.' not in key:
+            parser.error('invalid --set value: %s' % item)
+        settings.append((key, value))
+    # find reader component
+    reader = args.reader
+    if not reader:
+        readers = find_readers(load_network(args.script))
+        if len(readers) != 1:
+            parser.error('cannot choose reader from %s, use --reader' % (
+                ', '.join(readers) or 'no components'))
+        reader = readers[0]
+    # run jobs in a pool of processes, each used for one job only
+    jobs = []
+    for job, path in enumerate(paths):
+        jobs.append((job, args.script, reader, path, settings))
+    if hasattr(multiprocessing, 'get_context'):
+        ctx = multiprocessing.get_context('spawn')
+    else:
+        # Python 2 has no start method choice
+        ctx = multiprocessing
+    pool = ctx.Pool(max(1, min(args.jobs, len(jobs))), maxtasksperchild=1)
+    failed = 0
+    total_frames = 0
+    start = time.time()
+    try:
+        for result in pool.imap_unordered(run_job, jobs):
+            if result['error']:
+                failed += 1
+                print('%4d %s failed: %s' % (
+                    result['job'], result['path'], result['error']))
+            else:
+                total_frames += result['frames']
+                print('%4d %s %d frames, %.2fs, %.2f fps' % (
+                    result['job'], result['path'], result['frames'],
+                    result['elapsed'],
+                    result['frames'] / max(result['elapsed'], 1.0e-6)))
+            sys.stdout.flush()
+        pool.close()
+    except KeyboardInterrupt:
+        pool.terminate()
+        return 1
+    pool.join()
+    elapsed = time.time() - start
+    print('%d jobs, %d failed, %d frames, %.2fs, %.2f fps' % (
+        len(jobs), failed, total_frames, elapsed,
+        total_frames / max(elapsed, 1.0e-6)))
+    if failed:
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())